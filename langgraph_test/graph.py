@@ -16,13 +16,14 @@ class State(TypedDict, total=False):
     ent_out: Optional[dict]
     vector_out: Optional[dict]
     vec_payload: Optional[dict]
+    websearch_output: Optional[dict]
 
 # --- 0. Cache Probe ---
 async def cache_probe_node(state: State) -> State:
     cache = await hc.vector_cache_probe(state["query"])
     if cache.get("hits"):
         record_id = cache["hits"][0]["id"]
-        record = await hc.get_record_by_id(record_id)
+        record = cache["hits"][0].get("record") or await hc.get_record_by_id(record_id)
         return {
             **state,
             "cached": True,
@@ -1,5 +1,6 @@
 import asyncio
 import json
+import os
 from typing import Any, Dict
 import aiohttp
 
@@ -13,9 +14,14 @@ URLS: Dict[str, str] = {
     "vectorstore":  "http://mcp_vectorstore:8005/query",
     "record":       "http://mcp_vectorstore:8005/record"  # New endpoint
 }
+# Any endpoint can be overridden with MCP_URL_<NAME> (e.g. to point at local stubs)
+URLS = {name: os.getenv(f"MCP_URL_{name.upper()}", url) for name, url in URLS.items()}
 
 # Define timeouts per MCP
 SCRAPER_TIMEOUT = aiohttp.ClientTimeout(total=180)
+# Budget sent to the scraper: it answers with whatever finished by then,
+# instead of the whole call failing on SCRAPER_TIMEOUT
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", 60))
 DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=120)
 
 HEADERS = {"Content-Type": "application/json"}
@@ -59,8 +65,9 @@ async def call_search(query_payload: Dict[str, Any]) -> Dict[str, Any]:
     return await _post(URLS["search"], query_payload, DEFAULT_TIMEOUT)
 
 async def call_scraper(url_list_payload: Dict[str, Any]) -> Dict[str, Any]:
-    # Scraper gets 180s timeout
-    return await _post(URLS["scraper"], url_list_payload, SCRAPER_TIMEOUT)
+    # Scraper gets 180s timeout, but is asked to return partial results well before that
+    payload = {"deadline": SCRAPE_DEADLINE, **url_list_payload}
+    return await _post(URLS["scraper"], payload, SCRAPER_TIMEOUT)
 
 async def call_summarizer(corpus_payload: Dict[str, Any]) -> Dict[str, Any]:
     return await _post(URLS["summarizer"], corpus_payload, DEFAULT_TIMEOUT)
@@ -72,8 +79,11 @@ async def call_vectorizer(bundle_payload: Dict[str, Any]) -> Dict[str, Any]:
     return await _post(URLS["vectorizer"], bundle_payload, DEFAULT_TIMEOUT)
 
 async def vector_cache_probe(query: str) -> Dict[str, Any]:
-    return await _post(URLS["vectorstore"], {"query": query}, DEFAULT_TIMEOUT)
+    # Probe and fetch in one hop: the top hit comes back with its record inlined
+    payload = {"query": query, "top_k": 1, "include_record": True}
+    return await _post(URLS["vectorstore"], payload, DEFAULT_TIMEOUT)
 
 async def get_record_by_id(record_id: str) -> Dict[str, Any]:
-    url = f'{URLS["record"]}/{record_id}'
+    # Only the fields a cache hit uses; skips shipping the scraped article corpus
+    url = f'{URLS["record"]}/{record_id}?fields=summarizer_output,entity_output,websearch_output'
     return await _get(url, DEFAULT_TIMEOUT)
\ No newline at end of file
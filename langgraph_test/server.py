@@ -1,7 +1,6 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 from graph import build_graph
-import http_clients as hc # Import http_clients
 
 app = FastAPI(title="LangGraph Orchestrator", version="0.1.0")
 workflow = build_graph()
@@ -29,15 +28,14 @@ async def process_query(payload: QueryInput):
         
         # Return structure identical to your main.py
         if result.get("cached"):
-            record_id = result["vector_id"]
-            record = await hc.get_record_by_id(record_id)
+            # cache_probe_node already carries the record fields in the state
             return {
                 "query": payload.query, # Original query
                 "cached": True,
-                "vector_id": record_id,
-                "summary_text": record.get("summarizer_output"),
-                "entity_output": record.get("entity_output"),
-                "websearch_output": record.get("websearch_output")
+                "vector_id": result["vector_id"],
+                "summary_text": result.get("sm_out"),
+                "entity_output": result.get("ent_out"),
+                "websearch_output": result.get("websearch_output")
             }
         
         # For non-cached results, extract from the final state
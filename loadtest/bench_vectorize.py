@@ -0,0 +1,108 @@
+"""
+Ingest throughput benchmark for the vectorstore: /vectorize vs /vectorize_batch.
+
+Sends the same number of synthetic records through one-record-per-call
+/vectorize and through /vectorize_batch, and reports records/s and per-call
+latency for each. Needs a running vectorstore (and whatever Ollama/Postgres
+it points at); records get a unique run suffix so they never hit the
+ON CONFLICT path.
+
+    python bench_vectorize.py --url http://127.0.0.1:8005 --records 500 \
+        --batch-size 50 --concurrency 4 --article-bytes 8000
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, List
+
+import aiohttp
+
+from run import percentile
+from stubs import _filler
+
+
+def make_records(n: int, article_bytes: int, run_id: str) -> List[Dict]:
+    article = _filler(article_bytes)
+    return [
+        {
+            "query": f"benchmark case {i} {run_id}",
+            "tags": ["benchmark", run_id],
+            "category": "crime",
+            "scraper_output": article,
+            "summarizer_output": f"Summary of benchmark case {i}.",
+            "websearch_output": {"most_relevant": [{"title": f"Case {i}", "snippet": "stub"}]},
+            "entity_output": {"Accused": ["A. Person"], "Crime": "robbery"},
+        }
+        for i in range(n)
+    ]
+
+
+async def _bench(session: aiohttp.ClientSession, url: str, bodies: List[Dict], concurrency: int) -> Dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one(body: Dict) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                async with session.post(url, json=body) as r:
+                    await r.read()
+                    if r.status != 200:
+                        errors[f"HTTP {r.status}"] = errors.get(f"HTTP {r.status}", 0) + 1
+            except aiohttp.ClientError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in bodies))
+    elapsed = time.perf_counter() - t0
+    return {
+        "calls": len(bodies),
+        "elapsed_s": round(elapsed, 2),
+        "call_ms": {p: round(percentile(latencies, pct), 1) for p, pct in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "errors": errors,
+    }
+
+
+async def _main(args: argparse.Namespace) -> None:
+    base = args.url.rstrip("/")
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    reports = []
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        if args.mode in ("single", "both"):
+            records = make_records(args.records, args.article_bytes, uuid.uuid4().hex[:8])
+            report = await _bench(session, f"{base}/vectorize", records, args.concurrency)
+            reports.append({"mode": "single", "records": len(records), **report})
+        if args.mode in ("batch", "both"):
+            records = make_records(args.records, args.article_bytes, uuid.uuid4().hex[:8])
+            bodies = [{"records": records[i:i + args.batch_size]}
+                      for i in range(0, len(records), args.batch_size)]
+            report = await _bench(session, f"{base}/vectorize_batch", bodies, args.concurrency)
+            reports.append({"mode": f"batch x{args.batch_size}", "records": len(records), **report})
+
+    print(f"{'mode':<14}{'records':>9}{'rec/s':>9}{'call p50':>11}{'call p95':>11}{'call p99':>11}")
+    for r in reports:
+        r["records_per_s"] = round(r["records"] / r["elapsed_s"], 1) if r["elapsed_s"] else 0.0
+        ms = r["call_ms"]
+        print(f"{r['mode']:<14}{r['records']:>9}{r['records_per_s']:>9}{ms['p50']:>11}{ms['p95']:>11}{ms['p99']:>11}")
+        for error, n in r["errors"].items():
+            print(f"  error x{n}: {error}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /vectorize and /vectorize_batch ingest throughput.")
+    parser.add_argument("--url", default="http://127.0.0.1:8005", help="vectorstore base URL")
+    parser.add_argument("--mode", choices=["single", "batch", "both"], default="both")
+    parser.add_argument("--records", type=int, default=200, help="records per mode")
+    parser.add_argument("--batch-size", type=int, default=50, help="records per /vectorize_batch call")
+    parser.add_argument("--concurrency", type=int, default=4, help="calls in flight at once")
+    parser.add_argument("--article-bytes", type=int, default=4000, help="size of each record's scraper_output")
+    parser.add_argument("--timeout", type=float, default=600, help="per-call timeout in seconds")
+    parser.add_argument("--json", default="", help="also write the report to this JSON file")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,265 @@
+"""
+End-to-end load test of the orchestrators against local stub MCPs.
+
+Starts stubs.py, the orchestrator (orchestrator/api.py) and the LangGraph
+orchestrator (langgraph_test/server.py) as subprocesses, with every MCP URL
+pointed at the stubs. It then replays queries at a target QPS (open loop:
+requests are sent on schedule whether or not earlier ones have finished) and
+reports p50/p95/p99 latency per stage and overall.
+
+    python run.py --queries ../requests.jsonl --qps 5 --requests 200 \
+        --stub-args "--latency summarizer=500 --latency entity=200"
+
+Per-stage timings come from the orchestrator's NDJSON streaming mode: each
+stage's time is measured from the previous event, so "classifier" includes
+the cache probe. The LangGraph server has no streaming mode, so only overall
+latency is reported for it.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import shlex
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from stubs import PATHS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGE_ORDER = ["classifier", "search", "scraper", "summarizer", "entity", "vectorizer", "result"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def read_queries(path: str) -> List[str]:
+    """One query per line: plain text, or JSON with a "query" (or "title") field."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                obj = json.loads(line)
+                query = obj.get("query") or obj.get("title")
+                if query:
+                    queries.append(query)
+            else:
+                queries.append(line)
+    return queries
+
+
+class Result:
+    def __init__(self):
+        self.ok = False
+        self.status = 0
+        self.total = 0.0
+        self.stages: Dict[str, float] = {}
+        self.error = ""
+
+
+async def _call_orchestrator(session: aiohttp.ClientSession, base: str, query: str) -> Result:
+    res = Result()
+    t0 = last = time.perf_counter()
+    try:
+        async with session.post(f"{base}/process", json={"query": query, "stream": "ndjson"}) as r:
+            res.status = r.status
+            if r.status != 200:
+                res.error = (await r.text())[:200]
+                return res
+            async for line in r.content:
+                if not line.strip():
+                    continue
+                now = time.perf_counter()
+                event = json.loads(line)
+                res.stages[event["stage"]] = now - last
+                last = now
+                if event["stage"] == "result":
+                    res.ok = "error" not in event["data"]
+                    res.error = event["data"].get("error", "")
+    except Exception as exc:
+        res.error = str(exc)
+    finally:
+        res.total = time.perf_counter() - t0
+    return res
+
+
+async def _call_langgraph(session: aiohttp.ClientSession, base: str, query: str) -> Result:
+    res = Result()
+    t0 = time.perf_counter()
+    try:
+        async with session.post(f"{base}/process", json={"query": query}) as r:
+            res.status = r.status
+            body = await r.json()
+            res.ok = r.status == 200 and body.get("status") != "error"
+            res.error = "" if res.ok else str(body)[:200]
+    except Exception as exc:
+        res.error = str(exc)
+    finally:
+        res.total = time.perf_counter() - t0
+    return res
+
+
+async def replay(target: str, base: str, queries: List[str], qps: float, count: int, unique: bool) -> Dict:
+    call = _call_orchestrator if target == "orchestrator" else _call_langgraph
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = []
+        start = time.perf_counter()
+        for i in range(count):
+            delay = start + i / qps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            query = queries[i % len(queries)]
+            if unique:
+                # Defeat the caches/coalescing so every request runs the pipeline
+                query = f"{query} #{uuid.uuid4().hex[:8]}"
+            tasks.append(asyncio.ensure_future(call(session, base, query)))
+        results: List[Result] = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return summarize(target, results, elapsed, qps)
+
+
+def summarize(target: str, results: List[Result], elapsed: float, qps: float) -> Dict:
+    ok = [r for r in results if r.ok]
+    stages: Dict[str, List[float]] = {}
+    for r in ok:
+        for stage, secs in r.stages.items():
+            stages.setdefault(stage, []).append(secs)
+    stages["overall"] = [r.total for r in ok]
+
+    def _pcts(values: List[float]) -> Dict[str, float]:
+        return {f"p{p}": round(percentile(values, p) * 1000, 1) for p in (50, 95, 99)}
+
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r.ok:
+            key = f"{r.status}: {r.error[:80]}" if r.status else r.error[:80]
+            errors[key] = errors.get(key, 0) + 1
+
+    ordered = [s for s in STAGE_ORDER if s in stages] + ["overall"]
+    return {
+        "target": target,
+        "requests": len(results),
+        "succeeded": len(ok),
+        "target_qps": qps,
+        "achieved_qps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {stage: {"n": len(stages[stage]), **_pcts(stages[stage])} for stage in ordered},
+        "errors": errors,
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n=== {report['target']} ===")
+    print(f"requests {report['requests']}  succeeded {report['succeeded']}  "
+          f"qps target {report['target_qps']} achieved {report['achieved_qps']}")
+    print(f"{'stage':<12}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for stage, row in report["latency_ms"].items():
+        print(f"{stage:<12}{row['n']:>6}{row['p50']:>11}{row['p95']:>11}{row['p99']:>11}")
+    for error, n in report["errors"].items():
+        print(f"  error x{n}: {error}")
+
+
+def _spawn(cmd: List[str], cwd: str, env: Dict[str, str], log: Optional[str]) -> subprocess.Popen:
+    out = open(log, "w") if log else subprocess.DEVNULL
+    return subprocess.Popen(cmd, cwd=cwd, env=env, stdout=out, stderr=subprocess.STDOUT)
+
+
+async def _wait_healthy(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url) as r:
+                    if r.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not become healthy within {timeout:.0f}s")
+            await asyncio.sleep(0.2)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    queries = read_queries(args.queries)
+    if not queries:
+        sys.exit(f"no queries found in {args.queries}")
+    count = args.requests or len(queries)
+
+    stub_base = f"http://127.0.0.1:{args.stub_port}"
+    env = dict(os.environ)
+    env.update({f"MCP_URL_{name.upper()}": stub_base + path for name, path in PATHS.items()})
+    env.update(dict(item.split("=", 1) for item in args.env))
+
+    targets = ["orchestrator", "langgraph"] if args.target == "both" else [args.target]
+    bases = {
+        "orchestrator": f"http://127.0.0.1:{args.orchestrator_port}",
+        "langgraph": f"http://127.0.0.1:{args.langgraph_port}",
+    }
+    uvicorn = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+    log = (lambda name: os.path.join(args.log_dir, f"{name}.log")) if args.log_dir else (lambda name: None)
+
+    procs = []
+    try:
+        if not args.no_start:
+            procs.append(_spawn([sys.executable, "stubs.py", "--port", str(args.stub_port),
+                                 *shlex.split(args.stub_args)],
+                                os.path.dirname(os.path.abspath(__file__)), env, log("stubs")))
+            if "orchestrator" in targets:
+                procs.append(_spawn(uvicorn + ["--port", str(args.orchestrator_port), "api:app"],
+                                    os.path.join(ROOT, "orchestrator"), env, log("orchestrator")))
+            if "langgraph" in targets:
+                procs.append(_spawn(uvicorn + ["--port", str(args.langgraph_port), "server:app"],
+                                    os.path.join(ROOT, "langgraph_test"), env, log("langgraph")))
+        await _wait_healthy(f"{stub_base}/healthz")
+        for target in targets:
+            await _wait_healthy(f"{bases[target]}/healthz")
+
+        reports = []
+        for target in targets:
+            report = await replay(target, bases[target], queries, args.qps, count, args.unique)
+            print_report(report)
+            reports.append(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(reports, f, indent=2)
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the orchestrators against stub MCPs.")
+    parser.add_argument("--queries", default=os.path.join(ROOT, "requests.jsonl"),
+                        help="query file: plain text lines or JSON with a 'query'/'title' field")
+    parser.add_argument("--target", choices=["orchestrator", "langgraph", "both"], default="orchestrator")
+    parser.add_argument("--qps", type=float, default=2.0, help="target request rate")
+    parser.add_argument("--requests", type=int, default=0, help="total requests (default: one per query)")
+    parser.add_argument("--unique", action="store_true",
+                        help="make every query unique so caches and coalescing do not short-circuit it")
+    parser.add_argument("--stub-args", default="", help="extra arguments for stubs.py, e.g. \"--latency summarizer=500\"")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the services, e.g. MCP_LIMIT_SUMMARIZER=4")
+    parser.add_argument("--stub-port", type=int, default=8100)
+    parser.add_argument("--orchestrator-port", type=int, default=8200)
+    parser.add_argument("--langgraph-port", type=int, default=8207)
+    parser.add_argument("--no-start", action="store_true", help="use services that are already running")
+    parser.add_argument("--log-dir", default="", help="write service logs here instead of discarding them")
+    parser.add_argument("--json", default="", help="also write the report(s) to this JSON file")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,207 @@
+"""
+Local stand-ins for every MCP endpoint the orchestrators call.
+
+All endpoints are served from one aiohttp app so a single port covers the
+whole pipeline. Each endpoint sleeps for a configurable latency (plus jitter)
+and returns a payload of configurable size shaped like the real service.
+
+    python stubs.py --port 8100 --latency summarizer=2000 --article-bytes 8000
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+# Endpoint name (as in http_clients.URLS) -> path served by the stub
+PATHS = {
+    "classifier":  "/classify",
+    "search":      "/search",
+    "scraper":     "/scrape",
+    "scraper_domains": "/domains",
+    "summarizer":  "/summarize_case_raw",
+    "entity":      "/extract_raw",
+    "vectorizer":  "/vectorize",
+    "vectorizer_batch": "/vectorize_batch",
+    "vectorstore": "/query",
+    "record":      "/record",
+}
+
+# Rough latencies of the real services, in milliseconds
+DEFAULT_LATENCY_MS = {
+    "classifier":  800,
+    "search":      1200,
+    "scraper":     3000,
+    "scraper_domains": 5,
+    "summarizer":  15000,
+    "entity":      5000,
+    "vectorizer":  400,
+    "vectorizer_batch": 1500,
+    "vectorstore": 60,
+    "record":      40,
+}
+
+
+def _filler(n: int) -> str:
+    words = ("court", "verdict", "police", "report", "witness", "trial", "case", "jury")
+    out, size = [], 0
+    while size < n:
+        word = random.choice(words)
+        out.append(word)
+        size += len(word) + 1
+    return " ".join(out)[:n]
+
+
+class Stubs:
+    def __init__(self, args: argparse.Namespace):
+        self.latency = {**DEFAULT_LATENCY_MS, **args.latency}
+        self.jitter = args.jitter
+        self.hit_ratio = args.hit_ratio
+        self.stale_ratio = args.stale_ratio
+        self.search_results = args.search_results
+        self.article_bytes = args.article_bytes
+        self.summary_bytes = args.summary_bytes
+        # Payloads are built once; only sizes matter for the benchmark
+        self.article_text = _filler(self.article_bytes)
+        self.summary_text = _filler(self.summary_bytes)
+
+    async def _sleep(self, name: str) -> None:
+        base = self.latency[name] / 1000
+        await asyncio.sleep(max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    def _record(self, query: str) -> dict:
+        return {
+            "query": query,
+            "summarizer_output": self.summary_text,
+            "entity_output": {"accused": ["A. Person"], "victims": [], "orgs": ["Police"],
+                              "verdict": "guilty", "crime": "robbery", "outcome": "sentenced"},
+            "scraper_output": None,
+            "websearch_output": self._search_out(query),
+        }
+
+    def _search_out(self, query: str) -> dict:
+        articles = [
+            {"title": f"{query} – report {i}", "url": f"https://news.example/{uuid.uuid4().hex}",
+             "source": "Example News", "published": "1 day ago", "snippet": query,
+             "relevance_score": float(self.search_results - i)}
+            for i in range(self.search_results)
+        ]
+        return {"most_relevant": articles, "most_recent": articles[::-1]}
+
+    async def classify(self, request: web.Request) -> web.Response:
+        await self._sleep("classifier")
+        return web.json_response({"categories": ["crime", "legal"], "confidence": 0.9,
+                                  "tags": ["stub", "case", "2017"], "status": "ok",
+                                  "model_used": "stub"})
+
+    async def search(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await self._sleep("search")
+        return web.json_response(self._search_out(body.get("query", "")))
+
+    async def scrape(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await self._sleep("scraper")
+        results = [{**art, "status": "success", "text": self.article_text}
+                   for art in body.get("articles", [])]
+        return web.json_response({"results": results})
+
+    async def scraper_domains(self, request: web.Request) -> web.Response:
+        await self._sleep("scraper_domains")
+        # Every stub URL is on one healthy domain
+        return web.json_response({"domains": {"news.example": {"state": "closed", "samples": 20,
+                                                               "success_rate": 1.0, "score": 0.95}}})
+
+    async def summarize(self, request: web.Request) -> web.Response:
+        await request.read()
+        await self._sleep("summarizer")
+        return web.json_response({"raw_output": self.summary_text})
+
+    async def extract(self, request: web.Request) -> web.Response:
+        await request.read()
+        await self._sleep("entity")
+        return web.json_response({"raw_output": "Accused: A. Person\nVictims: \nOrganizations: Police\n"
+                                                "Verdict: guilty\nCrime: robbery\nOutcome: sentenced"})
+
+    async def vectorize(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await self._sleep("vectorizer")
+        return web.json_response({"id": str(uuid.uuid4()), "query": body.get("query", ""),
+                                  "message": "stub", "timestamp": "1970-01-01T00:00:00"})
+
+    async def vectorize_batch(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await self._sleep("vectorizer_batch")
+        results = [{"id": r.get("id") or str(uuid.uuid4()), "query": r.get("query", ""), "status": "inserted"}
+                   for r in body.get("records", [])]
+        return web.json_response({"results": results, "inserted": len(results), "duplicates": 0,
+                                  "timestamp": "1970-01-01T00:00:00"})
+
+    async def query(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await self._sleep("vectorstore")
+        if random.random() >= self.hit_ratio:
+            return web.json_response({"hits": []})
+        hit = {"id": str(uuid.uuid4()), "query": body.get("query", ""), "score": 0.9, "category": "crime",
+               # Stale hits are dated at the epoch so every TTL has expired
+               "timestamp": "1970-01-01T00:00:00Z" if random.random() < self.stale_ratio
+               else datetime.now(timezone.utc).isoformat()}
+        if body.get("include_record"):
+            hit["record"] = self._record(body.get("query", ""))
+        return web.json_response({"hits": [hit]})
+
+    async def record(self, request: web.Request) -> web.Response:
+        await self._sleep("record")
+        return web.json_response(self._record("stub"))
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"ok": True})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post(PATHS["classifier"], self.classify)
+        app.router.add_post(PATHS["search"], self.search)
+        app.router.add_post(PATHS["scraper"], self.scrape)
+        app.router.add_get(PATHS["scraper_domains"], self.scraper_domains)
+        app.router.add_post(PATHS["summarizer"], self.summarize)
+        app.router.add_post(PATHS["entity"], self.extract)
+        app.router.add_post(PATHS["vectorizer"], self.vectorize)
+        app.router.add_post(PATHS["vectorizer_batch"], self.vectorize_batch)
+        app.router.add_post(PATHS["vectorstore"], self.query)
+        app.router.add_get(PATHS["record"] + "/{record_id}", self.record)
+        app.router.add_get("/healthz", self.health)
+        return app
+
+
+def parse_latency(items: list) -> dict:
+    latency = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        if name not in DEFAULT_LATENCY_MS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; expected one of {list(PATHS)}")
+        latency[name] = float(value)
+    return latency
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serve stub MCP endpoints for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", action="append", default=[], metavar="ENDPOINT=MS",
+                        help=f"per-endpoint latency in ms, endpoints: {', '.join(PATHS)}")
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative latency jitter (0.2 = ±20%%)")
+    parser.add_argument("--hit-ratio", type=float, default=0.0, help="fraction of /query probes that hit")
+    parser.add_argument("--stale-ratio", type=float, default=0.0,
+                        help="fraction of hits past their TTL (each triggers a background refresh)")
+    parser.add_argument("--search-results", type=int, default=10, help="articles per search list")
+    parser.add_argument("--article-bytes", type=int, default=6000, help="scraped text per article")
+    parser.add_argument("--summary-bytes", type=int, default=3000, help="summary size")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.latency = parse_latency(args.latency)
+    web.run_app(Stubs(args).app(), host=args.host, port=args.port, print=None)
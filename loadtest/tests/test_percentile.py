@@ -0,0 +1,17 @@
+import pytest
+
+from run import percentile
+
+
+@pytest.mark.parametrize("values, pct, expected", [
+    (list(range(1, 101)), 50, 50),
+    (list(range(1, 101)), 95, 95),
+    (list(range(1, 101)), 99, 99),
+    (list(range(1, 101)), 100, 100),
+    (list(range(1, 11)), 50, 5),
+    (list(range(1, 11)), 95, 10),
+    ([3.0], 99, 3.0),
+    ([], 50, 0.0),
+])
+def test_nearest_rank(values, pct, expected):
+    assert percentile(list(reversed(values)), pct) == expected
@@ -0,0 +1,167 @@
+"""
+Persistent URL -> extracted text cache (SQLite).
+
+Entries are keyed on the normalized URL. Within SCRAPE_CACHE_TTL an entry is
+served without touching the network; after that it is revalidated with
+If-None-Match / If-Modified-Since, and a 304 costs one round trip instead of
+a full download and extraction. The file is capped at SCRAPE_CACHE_MAX_BYTES
+of text by evicting least recently used entries.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SCRAPE_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", "scrape_cache.sqlite")  # empty disables the cache
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", 6 * 3600))  # seconds before revalidating
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Seconds between re-reading the stored size total (other workers write to the same file)
+SCRAPE_CACHE_RESYNC = float(os.getenv("SCRAPE_CACHE_RESYNC", 60))
+# Cache hits whose access times are written back together
+ACCESS_FLUSH = 64
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
+
+
+def normalize_url(url: str) -> str:
+    """Cache key: lower-case scheme/host, no default port, fragment or tracking params, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class Entry(NamedTuple):
+    status: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched_at < SCRAPE_CACHE_TTL
+
+
+class PageCache:
+    """
+    Blocking SQLite calls; the scraper runs them in a worker thread. Several
+    processes may share the file, so the stored size total is re-read from it
+    every SCRAPE_CACHE_RESYNC seconds and before evicting.
+    """
+
+    def __init__(self, path: str, max_bytes: int = SCRAPE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url_key TEXT PRIMARY KEY, status TEXT NOT NULL, text TEXT NOT NULL, "
+            "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        # Covers both the LRU scan and SUM(size) without reading the page text
+        self._conn.execute("DROP INDEX IF EXISTS pages_accessed")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed_size ON pages (accessed_at, size)")
+        self._lock = threading.Lock()
+        # Hits since the last flush: url_key -> access time, written in one batch
+        self._accessed: Dict[str, float] = {}
+        self._sync_bytes()
+
+    def _sync_bytes(self) -> None:
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        self._synced_at = time.monotonic()
+
+    def _flush_accessed(self) -> None:
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE pages SET accessed_at = ? WHERE url_key = ?",
+                [(at, key) for key, at in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def get(self, url: str) -> Optional[Entry]:
+        key = normalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, text, etag, last_modified, fetched_at FROM pages WHERE url_key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._accessed[key] = time.time()
+                if len(self._accessed) >= ACCESS_FLUSH:
+                    self._flush_accessed()
+        return Entry(*row) if row else None
+
+    def put(self, url: str, status: str, text: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        key = normalize_url(url)
+        size = len(text.encode())
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(key, None)
+            old = self._conn.execute("SELECT size FROM pages WHERE url_key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, status, text, etag, last_modified, now, now, size),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            if time.monotonic() - self._synced_at > SCRAPE_CACHE_RESYNC:
+                self._sync_bytes()
+            if self._bytes > self.max_bytes:
+                self._sync_bytes()  # other workers may have evicted already
+                if self._bytes > self.max_bytes:
+                    self._evict()
+
+    def touch(self, url: str) -> None:
+        """Mark an entry as just revalidated (the server answered 304)."""
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url_key = ?", (now, now, key))
+
+    def _evict(self) -> None:
+        # Drop least recently used entries until 10 % below the cap, so eviction is not run on every put
+        self._flush_accessed()
+        target = self.max_bytes * 0.9
+        victims = []
+        cur = self._conn.execute("SELECT url_key, size FROM pages ORDER BY accessed_at")
+        for key, size in cur:
+            if self._bytes <= target:
+                break
+            victims.append((key,))
+            self._bytes -= size
+        cur.close()
+        self._conn.executemany("DELETE FROM pages WHERE url_key = ?", victims)
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_accessed()
+            self._conn.close()
+
+
+_cache: Optional[PageCache] = None
+
+
+def get_cache() -> Optional[PageCache]:
+    """The shared cache, opened on first use; None when SCRAPE_CACHE_PATH is empty."""
+    global _cache
+    if _cache is None and SCRAPE_CACHE_PATH:
+        _cache = PageCache(SCRAPE_CACHE_PATH)
+    return _cache
+
+
+def close_cache() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
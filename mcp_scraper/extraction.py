@@ -0,0 +1,165 @@
+"""
+Article text extraction in a process pool.
+
+trafilatura is CPU-bound and holds the GIL, so threads serialize it. Pages are
+handed to EXTRACT_WORKERS processes instead (0 falls back to a thread), after
+the raw HTML has been cut to EXTRACT_MAX_BYTES. Each document gets
+EXTRACT_TIMEOUT seconds: the worker stops itself with SIGALRM. A worker stuck
+where the alarm cannot reach it (inside C code) is still busy when the caller
+gives up, so the pool is killed and replaced; extractions it was running for
+other callers are retried once on the new pool. A caller that is cancelled
+keeps its worker slot until the worker is actually free again.
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import weakref
+from typing import Optional
+
+import trafilatura
+from trafilatura.utils import decode_file
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 1))
+EXTRACT_MAX_BYTES = int(os.getenv("EXTRACT_MAX_BYTES", 2_000_000))  # raw HTML kept per page
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", 10))  # seconds per document
+# Extra time the caller waits for a worker before abandoning the result
+EXTRACT_GRACE = 2.0
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None  # one per worker, so the time limit never counts queueing
+# Pools killed because a worker got stuck; BrokenProcessPool from one of these is not the page's fault
+_recycled: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+
+class ExtractTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise ExtractTimeout()
+
+
+def _init_worker() -> None:
+    signal.signal(signal.SIGALRM, _on_alarm)
+
+
+def extract_text(body: bytes) -> str:
+    return trafilatura.extract(decode_file(body), include_comments=False, include_tables=False) or ""
+
+
+def _extract_in_worker(body: bytes, timeout: float) -> Optional[str]:
+    """Runs in a pool process; None when the document ran out of time."""
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return extract_text(body)
+    except ExtractTimeout:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _warm_up() -> None:
+    """No-op task; unpickling it imports this module (and trafilatura) in the worker."""
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if _pool is None and EXTRACT_WORKERS > 0:
+        # spawn, not fork: the parent has an event loop, thread pools and an open SQLite handle
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        # The executor only spawns a worker when work is submitted; start them all now so
+        # spawn and import time do not count against the first pages' EXTRACT_TIMEOUT
+        for _ in range(EXTRACT_WORKERS):
+            _pool.submit(_warm_up)
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _recycle(pool: ProcessPoolExecutor) -> None:
+    """Kill a pool with a stuck worker; get_pool() starts a fresh one for the next page."""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    _recycled.add(pool)
+    print("[SCRAPER] Extraction worker stuck; restarting the process pool.")
+    # shutdown() leaves running workers alone (a stuck one would never exit) and forgets them
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.kill()
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # Nobody may await a future abandoned by its caller; keep its error out of the log
+    if not future.cancelled():
+        future.exception()
+
+
+async def _release_when_done(pool: ProcessPoolExecutor, future: asyncio.Future, timeout: float) -> None:
+    """After the caller was cancelled: free the slot once its worker is, recycling the pool if it is stuck."""
+    try:
+        await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        _recycle(pool)
+    except Exception:
+        pass
+    finally:
+        _slots.release()
+
+
+async def extract(body: bytes) -> Optional[str]:
+    """Extracted text of a downloaded page ("" if none found); None if extraction timed out."""
+    body = body[:EXTRACT_MAX_BYTES]
+    if EXTRACT_WORKERS <= 0:
+        return await asyncio.to_thread(extract_text, body)
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(EXTRACT_WORKERS)
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        await _slots.acquire()
+        # Taken after the slot: the pool may have been replaced while this call waited
+        pool = get_pool()
+        release = True
+        started = loop.time()
+        try:
+            future = loop.run_in_executor(pool, _extract_in_worker, body, EXTRACT_TIMEOUT)
+            future.add_done_callback(_retrieve)
+            # Shielded so the worker's future outlives a cancelled caller
+            return await asyncio.wait_for(asyncio.shield(future), EXTRACT_TIMEOUT + EXTRACT_GRACE)
+        except asyncio.TimeoutError:
+            # Stuck in C code where the alarm cannot interrupt it
+            _recycle(pool)
+            return None
+        except asyncio.CancelledError:
+            if future.cancelled() and pool in _recycled and attempt == 0:
+                continue  # still queued when the pool was killed for another caller
+            if not future.done():
+                release = False
+                remaining = started + EXTRACT_TIMEOUT + EXTRACT_GRACE - loop.time()
+                asyncio.ensure_future(_release_when_done(pool, future, max(remaining, 0)))
+            raise
+        except BrokenProcessPool:
+            if pool in _recycled and attempt == 0:
+                continue  # killed for another caller's stuck page, not this one
+            # A worker died (e.g. out of memory); start a fresh pool for later pages
+            if _pool is pool:
+                print("[SCRAPER] Extraction worker died; restarting the process pool.")
+                close_pool()
+            raise
+        finally:
+            if release:
+                _slots.release()
@@ -0,0 +1,149 @@
+"""
+Per-domain scrape health and circuit breaker.
+
+Each domain keeps its last BREAKER_WINDOW outcomes. An outcome is a success
+only if text was extracted; download failures, empty extractions and
+extraction timeouts all count against the domain. Once at least
+BREAKER_MIN_SAMPLES outcomes are known and BREAKER_FAILURE_RATIO of them
+failed, the breaker opens: URLs on that domain are answered `circuit_open`
+at once instead of waiting for another timeout. After BREAKER_COOLDOWN
+seconds the breaker is half-open and lets one probe through. A successful
+probe closes it; a failed one opens it for another cooldown.
+
+State is per instance and in memory, for at most BREAKER_MAX_DOMAINS domains
+(the least recently scraped are forgotten first and start over as closed);
+stats() is served on GET /domains.
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))
+BREAKER_MIN_SAMPLES = int(os.getenv("BREAKER_MIN_SAMPLES", 5))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", 0.8))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", 300))  # seconds open before a probe
+BREAKER_ENABLED = BREAKER_MIN_SAMPLES > 0
+BREAKER_MAX_DOMAINS = int(os.getenv("BREAKER_MAX_DOMAINS", 10_000))
+
+CIRCUIT_OPEN_STATUS = "circuit_open"
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def domain_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainHealth:
+    def __init__(self):
+        self.outcomes: Deque[Tuple[bool, Optional[float]]] = deque(maxlen=BREAKER_WINDOW)
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.time() - self.opened_at >= BREAKER_COOLDOWN:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def score(self) -> float:
+        """Smoothed success rate in [0, 1]; unknown domains start at 0.5, open breakers score 0."""
+        if self.state == OPEN:
+            return 0.0
+        successes = sum(ok for ok, _ in self.outcomes)
+        return (successes + 1) / (len(self.outcomes) + 2)
+
+    def stats(self) -> Dict:
+        latencies = sorted(latency for ok, latency in self.outcomes if latency is not None)
+        samples = len(self.outcomes)
+        state = self.state
+        return {
+            "state": state,
+            "samples": samples,
+            "success_rate": round(sum(ok for ok, _ in self.outcomes) / samples, 3) if samples else None,
+            "score": round(self.score, 3),
+            "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+            "retry_in": round(self.opened_at + BREAKER_COOLDOWN - time.time(), 1) if state == OPEN else None,
+            "last_success": self.last_success,
+            "last_failure": self.last_failure,
+        }
+
+
+_domains: "OrderedDict[str, DomainHealth]" = OrderedDict()
+
+
+def _get(url: str) -> DomainHealth:
+    domain = domain_of(url)
+    health = _domains.get(domain)
+    if health is None:
+        health = _domains[domain] = DomainHealth()
+        while len(_domains) > BREAKER_MAX_DOMAINS:
+            _domains.popitem(last=False)
+    else:
+        _domains.move_to_end(domain)
+    return health
+
+
+def allow(url: str) -> bool:
+    """Whether to scrape `url` now. In half-open state only one probe is let through."""
+    if not BREAKER_ENABLED:
+        return True
+    health = _get(url)
+    state = health.state
+    if state == CLOSED:
+        return True
+    if state == HALF_OPEN and not health.probing:
+        health.probing = True
+        return True
+    return False
+
+
+def record(url: str, ok: bool, latency: Optional[float] = None) -> None:
+    """Add one outcome for the URL's domain and move its breaker accordingly."""
+    health = _get(url)
+    now = time.time()
+    health.outcomes.append((ok, latency))
+    if ok:
+        health.last_success = now
+    else:
+        health.last_failure = now
+    if health.probing:
+        health.probing = False
+        if ok:
+            health.opened_at = None
+            health.outcomes.clear()
+            health.outcomes.append((ok, latency))
+        else:
+            health.opened_at = now
+        return
+    if health.opened_at is None and BREAKER_ENABLED and len(health.outcomes) >= BREAKER_MIN_SAMPLES:
+        failures = sum(not ok for ok, _ in health.outcomes)
+        if failures / len(health.outcomes) >= BREAKER_FAILURE_RATIO:
+            health.opened_at = now
+            print(f"[SCRAPER] Circuit opened for {domain_of(url)} "
+                  f"({failures}/{len(health.outcomes)} recent scrapes failed).")
+
+
+def abandon(url: str) -> None:
+    """The scrape was cancelled before it had an outcome; free the half-open probe."""
+    _get(url).probing = False
+
+
+def score(url: str) -> float:
+    return _get(url).score if domain_of(url) in _domains else 0.5
+
+
+def stats(domains: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+    """Stats per known domain, optionally only for `domains` (unknown ones are left out)."""
+    if domains is None:
+        return {domain: health.stats() for domain, health in _domains.items()}
+    keys = {domain_of(f"//{d.strip()}") for d in domains if d.strip()}
+    return {domain: _domains[domain].stats() for domain in keys if domain in _domains}
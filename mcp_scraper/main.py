@@ -1,8 +1,38 @@
+import json
+import math
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
-from scraper import scrape_articles
+from fastapi.responses import JSONResponse, StreamingResponse
+import health
+from cache import close_cache
+from extraction import close_pool, get_pool
+from scraper import DEADLINE_STATUS, close_client, scrape_articles, scrape_iter
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_pool()  # spawn extraction workers now rather than on the first request
+    yield
+    await close_client()
+    close_cache()
+    close_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+STREAM_MODES = ("ndjson",)
+
+
+async def _ndjson(articles, deadline, trace):
+    """One line per article as it finishes ({"index": ..., **result}), then a summary line."""
+    succeeded = partial = 0
+    async for index, result in scrape_iter(articles, deadline):
+        succeeded += result["status"] == "success"
+        partial += result["status"] == DEADLINE_STATUS
+        yield json.dumps({"index": index, **result}) + "\n"
+    print(f"[SCRAPER] Finished streaming {len(articles)} articles ({succeeded} succeeded).{trace}")
+    yield json.dumps({"done": True, "total": len(articles), "succeeded": succeeded, "partial": partial > 0}) + "\n"
 
-app = FastAPI()
 
 @app.post("/scrape")
 async def scrape_endpoint(request: Request):
@@ -10,7 +40,29 @@ async def scrape_endpoint(request: Request):
     articles = data.get("articles", [])
     if not isinstance(articles, list) or not articles:
         raise HTTPException(status_code=400, detail="Input must contain a non-empty 'articles' list.")
-    print(f"[SCRAPER] Started scraping {len(articles)} articles...")  # LOG for admin/monitoring
-    results = scrape_articles(articles)  # This should block until scraping is done
-    print(f"[SCRAPER] Finished scraping {len(articles)} articles.")
-    return JSONResponse({"results": results})  # 200 OK is returned *only when done*
+    mode = data.get("stream")
+    if mode and mode not in STREAM_MODES:
+        raise HTTPException(status_code=400, detail=f"'stream' must be one of {STREAM_MODES}")
+    # Seconds the caller is willing to wait; unfinished articles come back as "deadline_exceeded"
+    deadline = data.get("deadline")
+    # bool is an int subclass, so `true` would otherwise pass as a 1-second deadline
+    if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                 or not math.isfinite(deadline) or deadline <= 0):
+        raise HTTPException(status_code=400, detail="'deadline' must be a positive number of seconds.")
+
+    # The orchestrator's trace id, so these lines can be matched to its trace
+    trace_id = request.headers.get("X-Trace-Id")
+    trace = f" trace={trace_id[:8]}" if trace_id else ""
+    print(f"[SCRAPER] Started scraping {len(articles)} articles...{trace}")  # LOG for admin/monitoring
+    if mode == "ndjson":
+        return StreamingResponse(_ndjson(articles, deadline, trace), media_type="application/x-ndjson")
+    results = await scrape_articles(articles, deadline)  # other requests keep running meanwhile
+    print(f"[SCRAPER] Finished scraping {len(articles)} articles.{trace}")
+    partial = any(r["status"] == DEADLINE_STATUS for r in results)
+    return JSONResponse({"results": results, "partial": partial})
+
+
+@app.get("/domains")
+async def domains_endpoint(domains: Optional[str] = None):
+    """Rolling per-domain scrape stats and breaker state; `domains` is an optional comma-separated filter."""
+    return {"domains": health.stats(domains.split(",") if domains else None)}
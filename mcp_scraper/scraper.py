@@ -1,33 +1,235 @@
-import trafilatura
+"""
+Concurrent article download + extraction.
 
-def scrape_one(article):
-    url = article.get("url", "")
-    result = {
-        "url": url,
+Pages are fetched over one shared httpx connection pool with a global
+concurrency cap, a per-host cap (so one slow or rate-limiting site cannot
+take every slot) and a per-URL time limit, then extracted in a process pool
+(see extraction.py). Results keep the input order and the same status values
+as the old one-URL-at-a-time loop, plus `circuit_open` for domains whose
+breaker is open (see health.py).
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from trafilatura.downloads import USER_AGENT
+
+import health
+from cache import get_cache
+from extraction import EXTRACT_MAX_BYTES, extract
+
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", 10))  # URLs downloading at once, all requests
+SCRAPE_PER_HOST = int(os.getenv("SCRAPE_PER_HOST", 2))  # URLs downloading at once per host
+SCRAPE_URL_TIMEOUT = float(os.getenv("SCRAPE_URL_TIMEOUT", 20))  # seconds per download, queueing excluded
+SCRAPE_CONNECT_TIMEOUT = float(os.getenv("SCRAPE_CONNECT_TIMEOUT", 5))
+# Status of articles still running when the caller's deadline passed
+DEADLINE_STATUS = "deadline_exceeded"
+# Status of pages whose extraction ran past EXTRACT_TIMEOUT
+EXTRACT_TIMEOUT_STATUS = "extract_timeout"
+# Same lower bound trafilatura.fetch_url applies to a response body
+MIN_FILE_SIZE = 10
+
+_client: Optional[httpx.AsyncClient] = None
+_global_slots: Optional[asyncio.Semaphore] = None
+# host -> [semaphore, downloads holding or waiting for it]; entries exist only while in use
+_host_slots: Dict[str, list] = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client; connections are reused across requests and hosts."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            timeout=httpx.Timeout(SCRAPE_URL_TIMEOUT, connect=SCRAPE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=SCRAPE_CONCURRENCY, max_keepalive_connections=SCRAPE_CONCURRENCY),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _global():
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+    return _global_slots
+
+
+@asynccontextmanager
+async def _host_slot(url: str):
+    """Hold one of the host's SCRAPE_PER_HOST slots; idle hosts are forgotten."""
+    host = urlsplit(url).hostname or ""
+    entry = _host_slots.get(host)
+    if entry is None:
+        entry = _host_slots[host] = [asyncio.Semaphore(SCRAPE_PER_HOST), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            # Nobody holds or waits for it, so a later download can start a fresh one
+            del _host_slots[host]
+
+
+class Page(NamedTuple):
+    body: Optional[bytes]  # None when the server answered 304 Not Modified
+    etag: Optional[str]
+    last_modified: Optional[str]
+    elapsed: float  # seconds spent downloading, queueing for a slot excluded
+
+
+async def _download(url: str, headers: Dict[str, str]) -> Optional[Page]:
+    t0 = time.perf_counter()
+    async with get_client().stream("GET", url, headers=headers) as response:
+        etag, last_modified = response.headers.get("etag"), response.headers.get("last-modified")
+        if response.status_code == 304 and headers:
+            return Page(None, etag, last_modified, time.perf_counter() - t0)
+        if response.status_code != 200:
+            return None
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) >= EXTRACT_MAX_BYTES:
+                break  # only the first EXTRACT_MAX_BYTES are ever parsed
+    if len(body) < MIN_FILE_SIZE:
+        return None
+    return Page(bytes(body), etag, last_modified, time.perf_counter() - t0)
+
+
+async def fetch_url(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Page]:
+    """
+    Download one page like trafilatura.fetch_url (None on any failure). With
+    validators from an earlier download the request is conditional, and a
+    304 comes back as a Page without a body.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    async with _host_slot(url), _global():
+        try:
+            return await asyncio.wait_for(_download(url, headers), SCRAPE_URL_TIMEOUT)
+        except Exception:  # network errors, timeouts, bad URLs: all count as a failed download
+            return None
+
+
+def _result(article) -> dict:
+    return {
+        "url": article.get("url", ""),
         "title": article.get("title", ""),
         "source": article.get("source", ""),
         "published": article.get("published", ""),
         "status": "",
         "text": ""
     }
+
+
+async def scrape_one(article):
+    result = _result(article)
+    url = result["url"]
     if not url:
         result["status"] = "no_url"
         return result
 
+    cache = get_cache()
+    # SQLite is blocking; keep it off the event loop
+    cached = await asyncio.to_thread(cache.get, url) if cache else None
+    if cached and cached.fresh:
+        result["status"], result["text"] = cached.status, cached.text
+        return result
+
+    if not health.allow(url):
+        # The domain keeps failing; do not wait for it to time out again
+        result["status"] = health.CIRCUIT_OPEN_STATUS
+        return result
     try:
-        downloaded = trafilatura.fetch_url(url)
-        if not downloaded:
+        await _fetch_and_extract(url, cached, result)
+    except asyncio.CancelledError:
+        health.abandon(url)
+        raise
+    return result
+
+
+async def _fetch_and_extract(url: str, cached, result: dict) -> None:
+    page = None
+    try:
+        page = await (fetch_url(url, cached.etag, cached.last_modified) if cached else fetch_url(url))
+        if not page:
             result["status"] = "download_failed"
-            return result
-        text = trafilatura.extract(downloaded, include_comments=False, include_tables=False)
-        if text and len(text.strip()) > 100:
+            return
+        if page.body is None:
+            # 304: the cached extraction is still current
+            await asyncio.to_thread(get_cache().touch, url)
+            result["status"], result["text"] = cached.status, cached.text
+            return
+        # Extraction is CPU-bound; it runs in the process pool
+        text = await extract(page.body)
+        if text is None:
+            result["status"] = EXTRACT_TIMEOUT_STATUS
+            return
+        if len(text.strip()) > 100:
             result["status"] = "success"
             result["text"] = text.strip()
         else:
             result["status"] = "no_content"
+        cache = get_cache()
+        if cache:
+            await asyncio.to_thread(cache.put, url, result["status"], result["text"], page.etag, page.last_modified)
     except Exception as e:
         result["status"] = f"error: {str(e)}"
-    return result
+    finally:
+        if result["status"]:
+            health.record(url, result["status"] == "success", page.elapsed if page else None)
+
+
+async def scrape_iter(article_list, deadline: Optional[float] = None) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Yield (input index, result) for each article as soon as it finishes.
+    Once `deadline` seconds have passed, unfinished articles are cancelled and
+    yielded with status DEADLINE_STATUS, so every article is yielded exactly once.
+    """
+    # Tasks queue for download slots in creation order, so domains likely to succeed go first
+    order = sorted(range(len(article_list)), key=lambda i: -health.score(article_list[i].get("url", "")))
+    tasks = {asyncio.ensure_future(scrape_one(article_list[i])): i for i in order}
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline if deadline else None
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = None if end is None else max(0.0, end - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break  # deadline reached
+            for task in done:
+                yield tasks[task], task.result()
+        for task in sorted(pending, key=tasks.get):
+            task.cancel()
+            result = _result(article_list[tasks[task]])
+            result["status"] = DEADLINE_STATUS
+            yield tasks[task], result
+    finally:
+        # Also reached when the consumer goes away (e.g. a streaming client disconnects)
+        for task in pending:
+            task.cancel()
+
 
-def scrape_articles(article_list):
-    return [scrape_one(article) for article in article_list]
+async def scrape_articles(article_list, deadline: Optional[float] = None) -> List[dict]:
+    """Scrape every article concurrently; results are in input order."""
+    results: List[dict] = [{} for _ in article_list]
+    async for index, result in scrape_iter(article_list, deadline):
+        results[index] = result
+    return results
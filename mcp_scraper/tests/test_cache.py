@@ -0,0 +1,53 @@
+import pytest
+
+import cache
+from cache import PageCache, normalize_url
+
+
+@pytest.mark.parametrize("url, key", [
+    ("HTTPS://Example.COM:443/a?b=2&a=1#frag", "https://example.com/a?a=1&b=2"),
+    ("http://example.com:8080", "http://example.com:8080/"),
+    ("https://example.com/p?utm_source=x&fbclid=y&id=3", "https://example.com/p?id=3"),
+    ("  https://example.com/p?q=  ", "https://example.com/p?q="),
+])
+def test_normalize_url(url, key):
+    assert normalize_url(url) == key
+
+
+def test_get_put_and_touch(tmp_path):
+    pages = PageCache(str(tmp_path / "pages.sqlite"))
+    assert pages.get("https://example.com/a") is None
+    pages.put("https://example.com/a?utm_source=x", "success", "text", '"etag"', None)
+    entry = pages.get("https://EXAMPLE.com/a")
+    assert (entry.status, entry.text, entry.etag) == ("success", "text", '"etag"')
+    assert entry.fresh
+    pages._conn.execute("UPDATE pages SET fetched_at = 0")
+    assert not pages.get("https://example.com/a").fresh
+    pages.touch("https://example.com/a")
+    assert pages.get("https://example.com/a").fresh
+    pages.close()
+
+
+def test_evicts_least_recently_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "ACCESS_FLUSH", 1000)  # hits stay pending until eviction
+    pages = PageCache(str(tmp_path / "pages.sqlite"), max_bytes=300)
+    for name in "abc":
+        pages.put(f"https://example.com/{name}", "success", "x" * 100, None, None)
+    pages.get("https://example.com/a")
+    pages.put("https://example.com/d", "success", "x" * 100, None, None)
+    kept = [n for n in "abcd" if pages.get(f"https://example.com/{n}")]
+    pages.close()
+    assert kept == ["a", "d"]  # trimmed to 90 % of the cap, oldest reads first
+
+
+def test_size_total_follows_other_writers(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "SCRAPE_CACHE_RESYNC", 0)
+    path = str(tmp_path / "pages.sqlite")
+    mine, other = PageCache(path, max_bytes=250), PageCache(path, max_bytes=250)
+    other.put("https://example.com/other", "success", "x" * 200, None, None)
+    mine.put("https://example.com/mine", "success", "x" * 100, None, None)
+    # mine only counted its own 100 bytes, but the file holds 300
+    assert mine.get("https://example.com/other") is None
+    assert mine.get("https://example.com/mine") is not None
+    mine.close()
+    other.close()
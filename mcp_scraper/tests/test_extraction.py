@@ -0,0 +1,81 @@
+import asyncio
+import signal
+import sys
+import time
+
+import pytest
+
+import extraction
+
+
+def _stuck_or_echo(body, timeout):
+    """Pool worker stand-in: b"stuck" blocks where SIGALRM cannot interrupt it."""
+    if body == b"stuck":
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        time.sleep(60)
+    if body == b"slow":
+        time.sleep(0.5)
+    return body.decode()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Spawned workers unpickle by module name; other services' tests may have dropped ours
+    monkeypatch.setitem(sys.modules, "extraction", extraction)
+    monkeypatch.setattr(extraction, "EXTRACT_WORKERS", 1)
+    monkeypatch.setattr(extraction, "EXTRACT_TIMEOUT", 1.0)
+    monkeypatch.setattr(extraction, "EXTRACT_GRACE", 0.5)
+    monkeypatch.setattr(extraction, "_extract_in_worker", _stuck_or_echo)
+    monkeypatch.setattr(extraction, "_pool", None)
+    monkeypatch.setattr(extraction, "_slots", None)
+    # Start the worker up front so spawn time does not count against the limits below
+    extraction.get_pool().submit(_stuck_or_echo, b"warm", 0).result()
+    yield
+    extraction.close_pool()
+
+
+def test_stuck_worker_is_replaced_and_later_pages_get_full_time(pool):
+    async def run():
+        stuck_pool = extraction._pool
+        assert await extraction.extract(b"stuck") is None
+        assert extraction._pool is not stuck_pool
+        # A fresh worker, not one queued behind the stuck page
+        return await extraction.extract(b"healthy")
+
+    assert asyncio.run(run()) == "healthy"
+
+
+def test_cancelled_caller_keeps_the_slot_until_the_worker_is_free(pool):
+    async def run():
+        task = asyncio.ensure_future(extraction.extract(b"slow"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.sleep(0)
+        assert extraction._slots.locked()  # the worker is still busy with the abandoned page
+        return await extraction.extract(b"next")
+
+    assert asyncio.run(run()) == "next"
+
+
+def test_cancelled_stuck_extraction_recycles_the_pool(pool):
+    async def run():
+        stuck_pool = extraction._pool
+        task = asyncio.ensure_future(extraction.extract(b"stuck"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        result = await extraction.extract(b"after")
+        return stuck_pool, result
+
+    stuck_pool, result = asyncio.run(run())
+    assert result == "after"
+    assert stuck_pool in extraction._recycled
+
+
+def test_new_pool_starts_every_worker_up_front(monkeypatch):
+    monkeypatch.setitem(sys.modules, "extraction", extraction)
+    monkeypatch.setattr(extraction, "EXTRACT_WORKERS", 2)
+    monkeypatch.setattr(extraction, "_pool", None)
+    try:
+        assert len(extraction.get_pool()._processes) == 2
+    finally:
+        extraction.close_pool()
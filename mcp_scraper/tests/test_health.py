@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+import pytest
+
+import health
+
+URL = "https://www.flaky.example/article"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    monkeypatch.setattr(health, "_domains", OrderedDict())
+    monkeypatch.setattr(health, "BREAKER_MIN_SAMPLES", 5)
+    monkeypatch.setattr(health, "BREAKER_FAILURE_RATIO", 0.8)
+
+
+def _open_breaker():
+    for ok in (True, False, False, False, False):
+        health.record(URL, ok)
+
+
+def _cool_down():
+    health._domains["flaky.example"].opened_at -= health.BREAKER_COOLDOWN
+
+
+def test_stays_closed_below_min_samples_or_ratio():
+    for _ in range(3):
+        health.record(URL, False)
+    assert health.allow(URL)  # every scrape failed, but only 3 are known
+    health.record(URL, True)
+    health.record(URL, True)  # 3 of 5 failed, under 0.8
+    assert health.allow(URL)
+
+
+def test_opens_at_failure_ratio():
+    _open_breaker()
+    assert not health.allow(URL)
+    assert health.score(URL) == 0.0
+    assert health.stats(["flaky.example"])["flaky.example"]["state"] == health.OPEN
+
+
+def test_half_open_lets_one_probe_through():
+    _open_breaker()
+    _cool_down()
+    assert health.allow(URL)
+    assert not health.allow(URL)  # the probe is still running
+
+
+def test_successful_probe_closes_and_resets_the_window():
+    _open_breaker()
+    _cool_down()
+    health.allow(URL)
+    health.record(URL, True)
+    assert health.allow(URL) and health.allow(URL)
+    assert health.stats()["flaky.example"]["samples"] == 1
+
+
+def test_failed_probe_reopens_for_another_cooldown():
+    _open_breaker()
+    _cool_down()
+    health.allow(URL)
+    health.record(URL, False)
+    assert not health.allow(URL)
+    assert health.stats()["flaky.example"]["retry_in"] > 0
+
+
+def test_abandoned_probe_frees_the_slot():
+    _open_breaker()
+    _cool_down()
+    assert health.allow(URL)
+    health.abandon(URL)
+    assert health.allow(URL)
+
+
+def test_least_recently_used_domains_are_forgotten(monkeypatch):
+    monkeypatch.setattr(health, "BREAKER_MAX_DOMAINS", 2)
+    health.record("https://a.example/", True)
+    health.record("https://b.example/", True)
+    health.allow("https://a.example/x")  # a is now the most recent
+    health.record("https://c.example/", True)
+    assert list(health.stats()) == ["a.example", "c.example"]
+    assert health.score("https://b.example/") == 0.5
@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+# Raw JSON literals; NaN and Infinity are accepted by Python's json parser
+@pytest.mark.parametrize("deadline", ["true", "false", "0", "-1", '"5"', "NaN", "Infinity"])
+def test_invalid_deadline_is_rejected(deadline):
+    body = '{"articles": [{"url": "https://example.com"}], "deadline": %s}' % deadline
+    response = TestClient(main.app).post("/scrape", content=body, headers={"content-type": "application/json"})
+    assert response.status_code == 400
+    assert "deadline" in response.json()["detail"]
+
+
+def test_numeric_deadline_is_accepted(monkeypatch):
+    seen = []
+
+    async def scrape_articles(articles, deadline):
+        seen.append(deadline)
+        return [{"status": "ok"}]
+
+    monkeypatch.setattr(main, "scrape_articles", scrape_articles)
+    response = TestClient(main.app).post("/scrape", json={"articles": [{"url": "u"}], "deadline": 2.5})
+    assert response.status_code == 200
+    assert seen == [2.5]
+
+
+def test_trace_id_is_logged(monkeypatch, capsys):
+    async def scrape_articles(articles, deadline):
+        return [{"status": "success"}]
+
+    monkeypatch.setattr(main, "scrape_articles", scrape_articles)
+    TestClient(main.app).post("/scrape", json={"articles": [{"url": "u"}]},
+                              headers={"X-Trace-Id": "0123456789abcdef"})
+    assert "trace=01234567" in capsys.readouterr().out
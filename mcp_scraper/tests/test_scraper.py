@@ -0,0 +1,28 @@
+import asyncio
+
+import scraper
+
+
+def test_per_host_slots_cap_downloads_and_are_dropped_when_idle(monkeypatch):
+    monkeypatch.setattr(scraper, "SCRAPE_PER_HOST", 2)
+    monkeypatch.setattr(scraper, "_global_slots", None)
+    monkeypatch.setattr(scraper, "_host_slots", {})
+    running, peak = set(), []
+
+    async def download(url, headers):
+        running.add(url)
+        peak.append(len([u for u in running if "a.example" in u]))
+        await asyncio.sleep(0.01)
+        running.discard(url)
+        return scraper.Page(b"body", None, None, 0.01)
+
+    monkeypatch.setattr(scraper, "_download", download)
+
+    async def run():
+        urls = [f"https://a.example/{i}" for i in range(5)] + ["https://b.example/"]
+        return await asyncio.gather(*(scraper.fetch_url(url) for url in urls))
+
+    pages = asyncio.run(run())
+    assert all(page.body == b"body" for page in pages)
+    assert max(peak) == 2
+    assert scraper._host_slots == {}
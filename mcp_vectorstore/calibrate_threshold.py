@@ -0,0 +1,75 @@
+"""
+Pick CACHE_SIM_THRESHOLD for vector-mode cache probes from labelled query pairs.
+
+Each input line is a JSON object {"a": "...", "b": "...", "match": true|false}:
+whether a probe for `a` should be answered by the record stored for `b`.
+Both sides are embedded with the configured Ollama model (the same path
+/vectorize and /query use), and precision/recall are reported for a range of
+thresholds. The suggestion is the lowest threshold that reaches the target
+precision, i.e. the one with the best recall that still avoids wrong hits.
+
+    OLLAMA_BASE_URL=http://localhost:11434 python calibrate_threshold.py pairs.jsonl --precision 0.95
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from embedding import close_client, embed_texts
+
+
+def _cosines(a: List[List[float]], b: List[List[float]]) -> np.ndarray:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def sweep(scores: np.ndarray, labels: np.ndarray, thresholds) -> List[Dict]:
+    rows = []
+    for t in thresholds:
+        predicted = scores >= t
+        tp = int((predicted & labels).sum())
+        fp = int((predicted & ~labels).sum())
+        fn = int((~predicted & labels).sum())
+        rows.append({
+            "threshold": round(float(t), 3),
+            "precision": tp / (tp + fp) if tp + fp else 1.0,
+            "recall": tp / (tp + fn) if tp + fn else 0.0,
+        })
+    return rows
+
+
+def suggest(rows: List[Dict], target_precision: float) -> Tuple[float, Dict]:
+    for row in rows:  # ascending thresholds: first hit has the best recall
+        if row["precision"] >= target_precision:
+            return row["threshold"], row
+    return rows[-1]["threshold"], rows[-1]
+
+
+async def _main(args: argparse.Namespace) -> None:
+    with open(args.file, encoding="utf-8") as f:
+        pairs = [json.loads(line) for line in f if line.strip()]
+    try:
+        vectors = await embed_texts([p["a"] for p in pairs] + [p["b"] for p in pairs])
+    finally:
+        await close_client()
+    scores = _cosines(vectors[:len(pairs)], vectors[len(pairs):])
+    labels = np.array([bool(p["match"]) for p in pairs])
+    rows = sweep(scores, labels, np.arange(0.5, 1.0, 0.01))
+
+    print(f"{'threshold':>10}{'precision':>11}{'recall':>9}")
+    for row in rows[::5]:
+        print(f"{row['threshold']:>10}{row['precision']:>11.3f}{row['recall']:>9.3f}")
+    threshold, row = suggest(rows, args.precision)
+    print(f"\nCACHE_SIM_THRESHOLD={threshold}  (precision {row['precision']:.3f}, recall {row['recall']:.3f}, "
+          f"{len(pairs)} pairs, {int(labels.sum())} matches)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suggest CACHE_SIM_THRESHOLD from labelled query pairs.")
+    parser.add_argument("file", help='JSONL of {"a": ..., "b": ..., "match": true|false}')
+    parser.add_argument("--precision", type=float, default=0.95, help="minimum precision of cache hits")
+    asyncio.run(_main(parser.parse_args()))
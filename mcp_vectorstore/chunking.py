@@ -0,0 +1,106 @@
+"""
+Field-aware chunking of a record for embedding.
+
+Instead of embedding one huge concatenation (which the model silently
+truncates), each field is split into bounded chunks that are embedded
+separately. Per-chunk vectors are mean-pooled into the record vector.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CHUNK_CHARS = int(os.getenv("CHUNK_CHARS", 2000))  # ~500 tokens, well inside the context window
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+# Upper bound per record so embedding time stays predictable for huge articles
+MAX_CHUNKS = int(os.getenv("MAX_CHUNKS", 32))
+
+Chunk = Tuple[str, str]  # (field, text)
+
+
+def split_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into chunks of at most `size` chars, preferring sentence/paragraph ends."""
+    text = text.strip()
+    if len(text) <= size:
+        return [text] if text else []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Cut at the last boundary in the second half of the window, if any
+            cut = max(text.rfind("\n", start + size // 2, end), text.rfind(". ", start + size // 2, end))
+            if cut > start:
+                end = cut + 1
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
+
+
+def _websearch_text(websearch_output: Optional[dict]) -> str:
+    if not websearch_output:
+        return ""
+    lines, seen = [], set()
+    for key in ("most_relevant", "most_recent"):
+        for art in websearch_output.get(key, []) or []:
+            line = " – ".join(filter(None, [art.get("title", ""), art.get("snippet", "")]))
+            if line and line not in seen:
+                seen.add(line)
+                lines.append(line)
+    return "\n".join(lines)
+
+
+def _entity_text(entity_output: Optional[dict]) -> str:
+    if not entity_output:
+        return ""
+    lines = []
+    for key, value in entity_output.items():
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        if value:
+            lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+def build_chunks(
+    query: str,
+    tags: Optional[List[str]],
+    category: Optional[str],
+    scraper_output: Optional[str],
+    summarizer_output: Optional[str],
+    websearch_output: Optional[dict],
+    entity_output: Optional[dict],
+) -> List[Chunk]:
+    """
+    Chunk each field separately, most informative fields first, and cap the
+    total at MAX_CHUNKS (the scraped corpus is what gets trimmed).
+    """
+    header = " ".join(filter(None, [query, " ".join(tags or []), category or ""]))
+    fields: Dict[str, str] = {
+        "query": header,
+        "summary": summarizer_output or "",
+        "entities": _entity_text(entity_output),
+        "websearch": _websearch_text(websearch_output),
+        "scraper": scraper_output or "",
+    }
+    chunks: List[Chunk] = []
+    for field, text in fields.items():
+        for piece in split_text(text):
+            if len(chunks) >= MAX_CHUNKS:
+                return chunks
+            chunks.append((field, piece))
+    return chunks
+
+
+def pool_vectors(vectors: List[List[float]]) -> List[float]:
+    """Mean of the L2-normalized chunk vectors, re-normalized."""
+    if not vectors:
+        raise ValueError("pool_vectors needs at least one vector")
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    mean = (arr / norms).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
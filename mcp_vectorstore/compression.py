@@ -0,0 +1,101 @@
+"""
+Optional zstd compression of large record columns.
+
+A compressible column `<col>` can have a `<col>_z bytea` companion in
+query_embeddings (see README). With COMPRESS_COLUMNS=1, values above
+COMPRESS_MIN_BYTES are written zstd-compressed to the companion and the plain
+column is left NULL. Reads decode either form, so rows written before
+compression was switched on keep working. Companion columns are discovered
+at startup; without them (or without the `zstandard` package) nothing changes.
+"""
+import json
+import os
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+from psycopg.types.json import Jsonb
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+COMPRESS_COLUMNS = os.getenv("COMPRESS_COLUMNS", "0") == "1"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 3))
+
+# Column -> whether it holds JSON (jsonb) rather than text
+COMPRESSIBLE = {"scraper_output": False, "websearch_output": True}
+
+_available: Set[str] = set()  # compressible columns whose *_z companion exists
+
+
+async def discover(conn) -> None:
+    """Record which compressible columns have a *_z companion in the table."""
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'query_embeddings' AND column_name = ANY(%s)
+            """,
+            ([f"{col}_z" for col in COMPRESSIBLE],),
+        )
+        found = {row[0][:-2] for row in await cur.fetchall()}
+    _available.clear()
+    _available.update(found)
+    if found and zstandard is None:
+        print("[VECTORSTORE] compressed columns present but 'zstandard' is not installed; "
+              "compressed values cannot be read")
+    elif COMPRESS_COLUMNS and found != set(COMPRESSIBLE):
+        missing = sorted(set(COMPRESSIBLE) - found)
+        print(f"[VECTORSTORE] COMPRESS_COLUMNS=1 but no *_z column for {missing}; stored uncompressed")
+
+
+def _writes_enabled(col: str) -> bool:
+    return COMPRESS_COLUMNS and zstandard is not None and col in _available
+
+
+def insert_columns(col: str) -> List[str]:
+    """
+    Table columns written for `col`. The companion is always written when it
+    exists, so an upsert never leaves an older compressed value behind.
+    """
+    return [col, f"{col}_z"] if col in _available else [col]
+
+
+def encode(col: str, value: Any) -> Tuple:
+    """Values for insert_columns(col): (plain,) or (plain, compressed), at most one of them set."""
+    is_json = COMPRESSIBLE[col]
+    plain = Jsonb(value) if is_json and value is not None else value
+    if col not in _available:
+        return (plain,)
+    if value is None or not _writes_enabled(col):
+        return (plain, None)
+    raw = (json.dumps(value) if is_json else value).encode()
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return (plain, None)
+    return (None, zstandard.ZstdCompressor(level=COMPRESS_LEVEL).compress(raw))
+
+
+def select_columns(cols: Iterable[str]) -> List[str]:
+    """Expand requested record columns with the *_z companions that exist."""
+    out = []
+    for col in cols:
+        out.append(col)
+        if col in _available:
+            out.append(f"{col}_z")
+    return out
+
+
+def decode_row(cols: Iterable[str], values: Iterable[Any]) -> dict:
+    """Turn a row selected with select_columns(cols) back into {col: value}."""
+    it = iter(values)
+    record = {}
+    for col in cols:
+        value: Optional[Any] = next(it)
+        if col in _available:
+            compressed = next(it)
+            if compressed is not None:
+                raw = zstandard.ZstdDecompressor().decompress(compressed).decode()
+                value = json.loads(raw) if COMPRESSIBLE[col] else raw
+        record[col] = value
+    return record
@@ -1,18 +1,133 @@
+import asyncio
 import os
-import psycopg2
-from psycopg2.extras import register_uuid, DictCursor
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-register_uuid()  # make sure UUID works transparently
+import psycopg
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from fastapi import HTTPException
 
+from metrics import (
+    PG_POOL_HEALTHCHECK_FAILURES,
+    PG_POOL_IN_USE,
+    PG_POOL_OPEN,
+    PG_POOL_WAIT,
+    PG_POOL_WAITING,
+)
 
-def get_pg_conn():
-    """Return a fresh Postgres connection to Supabase (blocking)."""
-    dsn = (
-        f"dbname={os.getenv('PG_DB')} "
-        f"user={os.getenv('PG_USER')} "
-        f"password={os.getenv('PG_PASS')} "
-        f"host={os.getenv('PG_HOST')} "
-        f"port={os.getenv('PG_PORT', 5432)}"
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", 1))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", 10))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+# Idle connections are checked in the background this often (seconds)
+PG_HEALTHCHECK_INTERVAL = float(os.getenv("PG_HEALTHCHECK_INTERVAL", 30))
+FUZZY_SIM_THRESHOLD = float(os.getenv("FUZZY_SIM_THRESHOLD", 0.35))
+# HNSW search breadth: higher = better recall, slower probes
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 40))
+
+
+def _conninfo() -> str:
+    return psycopg.conninfo.make_conninfo(
+        dbname=os.getenv("PG_DB"),
+        user=os.getenv("PG_USER"),
+        password=os.getenv("PG_PASS"),
+        host=os.getenv("PG_HOST"),
+        port=os.getenv("PG_PORT", 5432),
+        sslmode="require",
     )
-    # Use DictCursor to get rows as dictionaries
-    return psycopg2.connect(dsn, sslmode="require", cursor_factory=DictCursor)
\ No newline at end of file
+
+
+async def _configure(conn: psycopg.AsyncConnection) -> None:
+    """Apply per-session settings once per physical connection."""
+    await conn.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+                       (str(FUZZY_SIM_THRESHOLD),))
+    await conn.execute("SELECT set_config('hnsw.ef_search', %s, false)", (str(HNSW_EF_SEARCH),))
+    await conn.commit()
+
+
+def to_vector(values) -> str:
+    """Format a float sequence as a pgvector literal, e.g. '[0.1,0.2]'."""
+    return "[" + ",".join(repr(float(v)) for v in values) + "]"
+
+
+_pool: Optional[AsyncConnectionPool] = None
+_health_task: Optional[asyncio.Task] = None
+
+
+async def _health_loop() -> None:
+    lost = 0
+    while True:
+        await asyncio.sleep(PG_HEALTHCHECK_INTERVAL)
+        try:
+            # Pings idle connections and replaces broken ones
+            await _pool.check()
+        except Exception:
+            pass
+        now_lost = _pool.get_stats().get("connections_lost", 0)
+        if now_lost > lost:
+            PG_POOL_HEALTHCHECK_FAILURES.inc(now_lost - lost)
+        lost = now_lost
+
+
+async def init_pool() -> None:
+    """Open the shared async connection pool (called at app startup)."""
+    global _pool, _health_task
+    _pool = AsyncConnectionPool(
+        _conninfo(),
+        min_size=PG_POOL_MIN,
+        max_size=PG_POOL_MAX,
+        timeout=PG_POOL_TIMEOUT,
+        configure=_configure,
+        open=False,
+    )
+    await _pool.open()
+    _health_task = asyncio.ensure_future(_health_loop())
+
+
+async def close_pool() -> None:
+    """Close every pooled connection (called at app shutdown)."""
+    global _pool, _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+        PG_POOL_OPEN.set(0)
+
+
+def update_pool_metrics() -> None:
+    """Refresh the pool gauges from the pool's own statistics."""
+    if _pool is not None:
+        PG_POOL_OPEN.set(_pool.get_stats().get("pool_size", 0))
+
+
+@asynccontextmanager
+async def pooled_conn() -> AsyncIterator[psycopg.AsyncConnection]:
+    """
+    Check a connection out of the pool for one unit of work.
+
+    Commits on success and rolls back on error. Raises 503 if no connection
+    frees up within PG_POOL_TIMEOUT.
+    """
+    if _pool is None:
+        await init_pool()
+
+    PG_POOL_WAITING.inc()
+    t0 = time.perf_counter()
+    waiting = True
+    try:
+        async with _pool.connection() as conn:
+            PG_POOL_WAITING.dec()
+            waiting = False
+            PG_POOL_WAIT.observe(time.perf_counter() - t0)
+            PG_POOL_IN_USE.inc()
+            try:
+                yield conn
+            finally:
+                PG_POOL_IN_USE.dec()
+    except PoolTimeout:
+        raise HTTPException(503, "Database connection pool exhausted")
+    finally:
+        if waiting:
+            PG_POOL_WAITING.dec()
@@ -1,19 +1,247 @@
 #embeddings.py
+import asyncio
+import hashlib
 import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
 import httpx
 from fastapi import HTTPException
 
+from metrics import EMBED_CACHE_HITS, EMBED_CACHE_MISSES, EMBED_REQUESTS
+
 OLLAMA_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL_VEC", "nomic-embed-text")
 TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", 30))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 32))
+
+# Inputs sent per Ollama /api/embed call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+# In-memory LRU of embeddings keyed on (model, sha256(text)); 0 disables
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", 4096))
+# Optional on-disk layer (SQLite file) behind the in-memory cache
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+# Vectors kept on disk (~4 * VECTOR_DIM bytes each); least recently used go first
+EMBED_CACHE_DISK_MAX = int(os.getenv("EMBED_CACHE_DISK_MAX", 100_000))
+# The row count is checked after this many inserts, so eviction stays cheap
+# and also sees rows written by other workers sharing the file
+_DISK_CHECK_EVERY = 1000
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for Ollama, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=OLLAMA_URL,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS,
+                                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client, _disk
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _disk is not None:
+        _disk.close()
+        _disk = None
+
+
+CacheKey = Tuple[str, str]
+
+
+def _key(text: str) -> CacheKey:
+    return (OLLAMA_MODEL, hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+
+class _DiskCache:
+    """SQLite-backed embedding store; vectors are kept as packed float32, capped at `max_rows`."""
+
+    def __init__(self, path: str, max_rows: int = EMBED_CACHE_DISK_MAX):
+        self.max_rows = max_rows
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(model TEXT, digest TEXT, vector BLOB, used_at REAL NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (model, digest))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "used_at" not in columns:  # file written before the cap existed
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._since_check = _DISK_CHECK_EVERY  # check on the first write
+
+    def get_many(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        found = {}
+        with self._lock:
+            for model, digest in keys:
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND digest = ?", (model, digest)
+                ).fetchone()
+                if row:
+                    found[(model, digest)] = array("f", row[0]).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET used_at = ? WHERE model = ? AND digest = ?",
+                    [(now, model, digest) for model, digest in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[CacheKey, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, digest, vector, used_at) VALUES (?, ?, ?, ?)",
+                [(model, digest, array("f", vec).tobytes(), now) for (model, digest), vec in items.items()],
+            )
+            self._since_check += len(items)
+            if self.max_rows > 0 and self._since_check >= _DISK_CHECK_EVERY:
+                self._since_check = 0
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # Trim to 90 % of the cap so the next check has headroom
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_rows:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY used_at LIMIT ?)",
+            (count - int(self.max_rows * 0.9),),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
 
+_memory: "OrderedDict[CacheKey, List[float]]" = OrderedDict()
+_disk: Optional[_DiskCache] = None
+# Ollama fetches in progress; concurrent misses for the same text wait on the same one
+_inflight: Dict[CacheKey, "asyncio.Task[Dict[CacheKey, List[float]]]"] = {}
 
-def embed_text(text: str) -> list[float]:
-    """Call Ollama's /api/embeddings endpoint and return the embedding vector."""
-    payload = {"model": OLLAMA_MODEL, "prompt": text}
+
+def _get_disk() -> Optional[_DiskCache]:
+    global _disk
+    if _disk is None and EMBED_CACHE_PATH:
+        _disk = _DiskCache(EMBED_CACHE_PATH)
+    return _disk
+
+
+def _remember(key: CacheKey, vec: List[float]) -> None:
+    if EMBED_CACHE_SIZE <= 0:
+        return
+    _memory[key] = vec
+    _memory.move_to_end(key)
+    while len(_memory) > EMBED_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+
+async def _ollama_embed(texts: List[str]) -> List[List[float]]:
+    """One Ollama /api/embed call for many inputs."""
+    payload = {"model": OLLAMA_MODEL, "input": texts}
     try:
-        r = httpx.post(f"{OLLAMA_URL}/api/embeddings", json=payload, timeout=TIMEOUT)
+        EMBED_REQUESTS.inc()
+        r = await get_client().post("/api/embed", json=payload)
         r.raise_for_status()
-        return r.json()["embedding"]
+        embeddings = r.json()["embeddings"]
     except Exception as exc:
         raise HTTPException(502, f"Ollama embed error: {exc}")
+    if len(embeddings) != len(texts):
+        raise HTTPException(502, "Ollama returned a different number of embeddings than inputs")
+    return embeddings
+
+
+async def _fetch(keys: List[CacheKey], texts: List[str]) -> Dict[CacheKey, List[float]]:
+    """Embed cache misses in batches of EMBED_BATCH_SIZE and store them in both cache layers."""
+    batches = [list(range(i, min(i + EMBED_BATCH_SIZE, len(keys)))) for i in range(0, len(keys), EMBED_BATCH_SIZE)]
+    results = await asyncio.gather(*(_ollama_embed([texts[i] for i in batch]) for batch in batches))
+    fresh = {}
+    for batch, embeddings in zip(batches, results):
+        for i, vec in zip(batch, embeddings):
+            fresh[keys[i]] = vec
+            _remember(keys[i], vec)
+    disk = _get_disk()
+    if disk is not None:
+        await asyncio.to_thread(disk.put_many, fresh)
+    return fresh
+
+
+def _start_fetch(keys: List[CacheKey], texts: List[str]) -> "asyncio.Task[Dict[CacheKey, List[float]]]":
+    task = asyncio.ensure_future(_fetch(keys, texts))
+    for key in keys:
+        _inflight[key] = task
+
+    def _done(t: asyncio.Task) -> None:
+        for key in keys:
+            if _inflight.get(key) is t:
+                del _inflight[key]
+        if not t.cancelled():
+            t.exception()  # waiters get it re-raised; don't log it as never retrieved
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed many texts, serving repeats from the cache and sending the rest to
+    Ollama in batches of EMBED_BATCH_SIZE. Output order matches the input.
+    """
+    keys = [_key(text) for text in texts]
+    vectors: Dict[CacheKey, List[float]] = {}
+
+    for key in keys:
+        vec = _memory.get(key)
+        if vec is not None:
+            _memory.move_to_end(key)
+            vectors[key] = vec
+            EMBED_CACHE_HITS.labels("memory").inc()
+
+    disk = _get_disk()
+    missing = [k for k in dict.fromkeys(keys) if k not in vectors]
+    if missing and disk is not None:
+        found = await asyncio.to_thread(disk.get_many, missing)
+        for key, vec in found.items():
+            _remember(key, vec)
+            vectors[key] = vec
+        if found:
+            EMBED_CACHE_HITS.labels("disk").inc(len(found))
+        missing = [k for k in missing if k not in vectors]
+
+    if missing:
+        tasks = {key: _inflight[key] for key in missing if key in _inflight}
+        if tasks:
+            EMBED_CACHE_HITS.labels("inflight").inc(len(tasks))
+        own = [key for key in missing if key not in tasks]
+        if own:
+            EMBED_CACHE_MISSES.inc(len(own))
+            text_for = dict(zip(keys, texts))
+            task = _start_fetch(own, [text_for[k] for k in own])
+            tasks.update(dict.fromkeys(own, task))
+        for task in set(tasks.values()):
+            # Shielded: one caller going away must not cancel a fetch others wait on
+            fresh = await asyncio.shield(task)
+            vectors.update((key, fresh[key]) for key, t in tasks.items() if t is task)
+
+    return [vectors[key] for key in keys]
+
+
+async def embed_text(text: str) -> list[float]:
+    """Embed one text via the cached, batched path."""
+    return (await embed_texts([text]))[0]
@@ -1,41 +1,112 @@
 """
 Vectorizer MCP
 Endpoints:
-    POST /vectorize  – store a new aggregated record + embedding
-    POST /query      – semantic search for cache / RAG retrieval
+    POST /vectorize        – store a new aggregated record + embedding
+    POST /vectorize_batch  – store many records in one transaction
+    POST /query            – semantic search for cache / RAG retrieval
+    GET  /record/{id}      – one record, optionally projected with ?fields=
+    POST /records          – bulk record lookup by id
 """
 #main.py
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from decimal import Decimal
 from fastapi import HTTPException
 
-import httpx
-import psycopg2
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from psycopg.types.json import Jsonb
+from pydantic import BaseModel, Field, field_validator
 
-from db_utils import get_pg_conn
-from embedding import embed_text
+import compression
+from chunking import build_chunks, pool_vectors
+from db_utils import close_pool, init_pool, pooled_conn, to_vector, update_pool_metrics
+from embedding import OLLAMA_MODEL, close_client, embed_text, embed_texts
+from memindex import get_index, load_index, unload_index
 
 # ─────────────────────────── FastAPI setup ────────────────────────────
-app = FastAPI(title="Vectorizer MCP", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connections are opened once and reused across requests
+    await init_pool()
+    async with pooled_conn() as conn:
+        await compression.discover(conn)
+    await load_index(VECTOR_DIM)
+    yield
+    await unload_index()
+    await close_pool()
+    await close_client()
+
+app = FastAPI(title="Vectorizer MCP", version="0.1.0", lifespan=lifespan)
+# Record payloads are mostly prose; compress responses for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_BYTES", 1024)))
+
+
+@app.middleware("http")
+async def log_trace_id(request: Request, call_next):
+    # Orchestrator pipeline runs send their trace id; log it so calls can be matched to traces
+    trace_id = request.headers.get("X-Trace-Id")
+    if not trace_id:
+        return await call_next(request)
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    print(f"[VECTORSTORE] {request.method} {request.url.path} {response.status_code} "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms trace={trace_id[:8]}")
+    return response
 
 VECTOR_DIM = int(os.getenv("VECTOR_DIM", 768))
-SIM_THRESHOLD = float(os.getenv("CACHE_SIM_THRESHOLD", 0.9))  # 90 % match
+# Minimum cosine between the probe and a stored query's own embedding
+# (query_embedding, not the pooled record vector); tune with calibrate_threshold.py
+SIM_THRESHOLD = float(os.getenv("CACHE_SIM_THRESHOLD", 0.85))
+
+# /query search mode when the caller does not pick one
+QUERY_MODES = ("trigram", "vector", "hybrid")
+QUERY_MODE = os.getenv("QUERY_MODE", "trigram")
+if QUERY_MODE not in QUERY_MODES:
+    raise RuntimeError(f"QUERY_MODE must be one of {QUERY_MODES}, got {QUERY_MODE!r}")
+# Hybrid score = w * cosine similarity + (1 - w) * trigram similarity
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", 0.7))
+HYBRID_SIM_THRESHOLD = float(os.getenv("HYBRID_SIM_THRESHOLD", 0.75))
+# ANN / trigram candidates gathered per requested hit before re-scoring in hybrid mode
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 10))
+# Persist per-chunk vectors in query_embedding_chunks (needs the table, see README)
+STORE_CHUNKS = os.getenv("STORE_CHUNKS", "1") == "1"
+# Records accepted per /vectorize_batch call (all go in one INSERT statement)
+VECTORIZE_BATCH_MAX = int(os.getenv("VECTORIZE_BATCH_MAX", 500))
+# Ids accepted per /records lookup
+RECORDS_MAX = int(os.getenv("RECORDS_MAX", 500))
 
 
 # ─────────────────────────── Pydantic models ──────────────────────────
-class VectorizeBody(BaseModel):
-    query: str = Field(..., min_length=1)
+class VectorizeRecord(BaseModel):
+    # Callers that hand out the id before the write (orchestrator write-behind) supply it
+    id: Optional[uuid.UUID] = None
+    query: str
     tags: Optional[List[str]] = None
     category: Optional[str] = None
     scraper_output: Optional[str] = None
     summarizer_output: Optional[str] = None
     websearch_output: Optional[dict] = None
     entity_output: Optional[dict] = None
+    # Replace the stored record for this query instead of keeping the old one (refreshes)
+    upsert: bool = False
+
+
+class VectorizeBody(VectorizeRecord):
+    query: str = Field(..., min_length=1)
+
+    @field_validator("query")
+    @classmethod
+    def _query_not_blank(cls, query: str) -> str:
+        # A blank query leaves nothing to chunk or embed
+        if not query.strip():
+            raise ValueError("query must not be blank")
+        return query
 
 
 class VectorizeResponse(BaseModel):
@@ -43,21 +114,44 @@ class VectorizeResponse(BaseModel):
     query: str
     message: str
     timestamp: datetime
+    status: Literal["inserted", "updated", "duplicate"] = "inserted"
 
 
-class QueryBody(BaseModel):
-    query: str
-    top_k: int = 3
+class VectorizeBatchBody(BaseModel):
+    # Blank queries are reported per record ("invalid") rather than failing the batch
+    records: List[VectorizeRecord] = Field(..., min_length=1, max_length=VECTORIZE_BATCH_MAX)
 
 
-class QueryHit(BaseModel):
+class VectorizeBatchItem(BaseModel):
     id: str
     query: str
-    score: float
+    status: Literal["inserted", "updated", "duplicate", "invalid"]
 
 
-class QueryResponse(BaseModel):
-    hits: List[QueryHit]
+class VectorizeBatchResponse(BaseModel):
+    results: List[VectorizeBatchItem]
+    inserted: int
+    updated: int = 0
+    duplicates: int
+    invalid: int = 0
+    timestamp: datetime
+
+
+class EmbedBody(BaseModel):
+    texts: List[str] = Field(..., min_length=1)
+
+
+class EmbedResponse(BaseModel):
+    model: str
+    embeddings: List[List[float]]
+
+
+class QueryBody(BaseModel):
+    query: str
+    top_k: int = 3
+    include_record: bool = False  # inline the cache-hit record fields on each hit
+    mode: Literal["trigram", "vector", "hybrid"] = QUERY_MODE
+    min_score: Optional[float] = None  # overrides the mode's default threshold
 
 
 class RecordResponse(BaseModel):
@@ -68,125 +162,452 @@ class RecordResponse(BaseModel):
     websearch_output: Optional[dict] = None
 
 
+class RecordsBody(BaseModel):
+    ids: List[uuid.UUID] = Field(..., min_length=1, max_length=RECORDS_MAX)
+    fields: Optional[List[str]] = None  # default: every record field
+
+
+class RecordsResponse(BaseModel):
+    records: Dict[str, RecordResponse]
+    missing: List[str]
+
+
+class QueryHit(BaseModel):
+    id: str
+    query: str
+    score: float
+    # Freshness metadata so callers can apply their own TTLs
+    timestamp: Optional[datetime] = None
+    category: Optional[str] = None
+    record: Optional[RecordResponse] = None
+
+
+class QueryResponse(BaseModel):
+    hits: List[QueryHit]
+    mode: str
+
+
 # ───────────────────────────── Endpoints ──────────────────────────────
-@app.post("/vectorize", response_model=VectorizeResponse)
-def vectorize(body: VectorizeBody):
-    """Store a new aggregated record and its embedding; return UUID."""
-    # Combine everything into one big context string
+def _all_text(body: VectorizeRecord) -> str:
+    """
+    Short searchable summary of the record (query, tags, category, summary,
+    entities). The scraped corpus and web-search results have their own,
+    possibly compressed, columns and are not copied in again.
+    """
     all_parts = [
         body.query,
         " ".join(body.tags or []),
         body.category or "",
-        body.scraper_output or "",
         body.summarizer_output or "",
     ]
-    if body.websearch_output:
-        all_parts.append(str(body.websearch_output))
     if body.entity_output:
         all_parts.append(str(body.entity_output))
+    return " ".join(filter(None, all_parts))
+
+
+def _chunks(body: VectorizeRecord):
+    return build_chunks(
+        body.query, body.tags, body.category, body.scraper_output,
+        body.summarizer_output, body.websearch_output, body.entity_output,
+    )
 
-    all_text = " ".join(filter(None, all_parts))
 
-    # Generate embedding
-    embedding = embed_text(all_text)
-    if len(embedding) != VECTOR_DIM:
+def _record_values(body: VectorizeRecord, record_id: str, embedding: List[float],
+                   query_embedding: List[float], now: datetime) -> Dict[str, Any]:
+    """Column -> value for one query_embeddings row; large columns may go to their *_z companion."""
+    values: Dict[str, Any] = {
+        "id": record_id,
+        "query": body.query,
+        "tags": body.tags,
+        "category": body.category,
+        "summarizer_output": body.summarizer_output,
+        "entity_output": Jsonb(body.entity_output) if body.entity_output else None,
+        "all_text": _all_text(body),
+        "embedding": embedding,
+        "query_embedding": query_embedding,
+        "timestamp": now,
+    }
+    for col in compression.COMPRESSIBLE:
+        values.update(zip(compression.insert_columns(col), compression.encode(col, getattr(body, col))))
+    return values
+
+
+def _insert_sql(rows: List[Dict[str, Any]], upsert_on: Optional[str] = None) -> tuple:
+    """
+    Multi-row INSERT of query_embeddings rows and its flat parameter list.
+    Returns (id, query, inserted) per stored row. Without `upsert_on` a row
+    whose query (or id) exists is skipped. With "id" the row with that id is
+    replaced but keeps its stored query and query embedding (a refresh of a
+    fuzzy hit sends the caller's wording); with "query" the row with that
+    query keeps its id.
+    """
+    cols = list(rows[0])
+    placeholders = "(" + ",".join(["%s"] * len(cols)) + ")"
+    if upsert_on:
+        keep = ("id", "query", "query_embedding") if upsert_on == "id" else ("id", "query")
+        updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in cols if col not in keep)
+        conflict = f"ON CONFLICT ({upsert_on}) DO UPDATE SET {updates}"
+    else:
+        conflict = "ON CONFLICT DO NOTHING"
+    sql = f"""
+        INSERT INTO query_embeddings ({", ".join(cols)})
+        VALUES {",".join([placeholders] * len(rows))}
+        {conflict}
+        RETURNING id, query, (xmax = 0) AS inserted
+    """
+    return sql, [row[col] for row in rows for col in cols]
+
+
+async def _store_chunks(cur, record_id: str, chunks, chunk_vectors, replace: bool) -> None:
+    if replace:
+        await cur.execute("DELETE FROM query_embedding_chunks WHERE record_id = %s", (record_id,))
+    await cur.executemany(
+        """
+        INSERT INTO query_embedding_chunks (record_id, chunk_index, field, content, embedding)
+        VALUES (%s,%s,%s,%s,%s)
+        """,
+        [
+            (record_id, i, field, text, vec)
+            for i, ((field, text), vec) in enumerate(zip(chunks, chunk_vectors))
+        ],
+    )
+
+
+@app.post("/vectorize", response_model=VectorizeResponse)
+async def vectorize(body: VectorizeBody):
+    """Store a new aggregated record and its embedding; return UUID."""
+    # Embed bounded, field-aware chunks in one batched call and pool them into
+    # the record vector, instead of one oversized string the model truncates.
+    # The bare query is embedded alongside: vector-mode probes match against it.
+    chunks = _chunks(body)
+    vectors = await embed_texts([body.query] + [text for _, text in chunks])
+    if any(len(v) != VECTOR_DIM for v in vectors):
         raise HTTPException(500, "Unexpected embedding dimension")
+    query_embedding, chunk_vectors = vectors[0], vectors[1:]
+    embedding = pool_vectors(chunk_vectors)
 
-    record_id = str(uuid.uuid4())
+    record_id = str(body.id or uuid.uuid4())
     now = datetime.utcnow()
 
     # Insert into Supabase / Postgres
     print(f"[VECTORSTORE] websearch_output before insert: {body.websearch_output}")
-    with get_pg_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO query_embeddings (
-                id, query, tags, category, scraper_output,
-                summarizer_output, websearch_output, entity_output,
-                all_text, embedding, timestamp
-            )
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (query) DO NOTHING
-            """,
-            (
-                record_id,
-                body.query,
-                body.tags,
-                body.category,
-                body.scraper_output,
-                body.summarizer_output,
-                psycopg2.extras.Json(body.websearch_output) if body.websearch_output is not None else None,
-                psycopg2.extras.Json(body.entity_output) if body.entity_output else None,
-                all_text,
-                embedding,
-                now,
-            ),
-        )
+    async with pooled_conn() as conn, conn.cursor() as cur:
+        upsert_on = ("id" if body.id else "query") if body.upsert else None
+        await cur.execute(*_insert_sql([_record_values(body, record_id, embedding, query_embedding, now)],
+                                       upsert_on))
+        stored = await cur.fetchone()
+        if stored:
+            # An upsert keeps the existing row's id
+            record_id, status = str(stored[0]), "inserted" if stored[2] else "updated"
+            if STORE_CHUNKS:
+                await _store_chunks(cur, record_id, chunks, chunk_vectors, replace=status == "updated")
+        else:
+            status = "duplicate"
+
+    index = get_index()
+    # A row updated by id kept its query, so its index entry is still right
+    if stored and index is not None and (status == "inserted" or upsert_on != "id"):
+        index.add(record_id, body.query, query_embedding)
 
     return {
         "id": record_id,
         "query": body.query,
         "message": "Embedding generated and stored. Use the UUID for retrieval.",
         "timestamp": now,
+        "status": status,
     }
 
-FUZZY_SIM_THRESHOLD = float(os.getenv("FUZZY_SIM_THRESHOLD", 0.35))
 
-@app.post("/query", response_model=QueryResponse)
-def query(body: QueryBody):
-    with get_pg_conn() as conn, conn.cursor() as cur:
-        # 1️⃣ set the similarity threshold (separate execute)
-        cur.execute(
-            "SET pg_trgm.similarity_threshold = %s;",
-            (FUZZY_SIM_THRESHOLD,)
-        )
+@app.post("/vectorize_batch", response_model=VectorizeBatchResponse)
+async def vectorize_batch(body: VectorizeBatchBody):
+    """
+    Store many records at once: every chunk of every record is embedded through
+    one batched embed_texts call, and all rows go in with a single multi-row
+    INSERT in one transaction. Records whose query (or id) already exists are
+    reported as "duplicate" rather than failing the batch, unless they ask to
+    upsert, in which case they replace the stored record ("updated"). Records
+    with a blank query are skipped and reported as "invalid".
+    """
+    valid = [i for i, r in enumerate(body.records) if r.query.strip()]
+    records = [body.records[i] for i in valid]
+    per_record = [_chunks(r) for r in records]
+    # Per record: its bare query, then its chunks
+    flat_vectors = await embed_texts(
+        [text for r, chunks in zip(records, per_record) for text in [r.query] + [t for _, t in chunks]]
+    )
+    if any(len(v) != VECTOR_DIM for v in flat_vectors):
+        raise HTTPException(500, "Unexpected embedding dimension")
+
+    query_embeddings, chunk_vectors, offset = [], [], 0
+    for chunks in per_record:
+        query_embeddings.append(flat_vectors[offset])
+        chunk_vectors.append(flat_vectors[offset + 1:offset + 1 + len(chunks)])
+        offset += 1 + len(chunks)
+    embeddings = [pool_vectors(vectors) for vectors in chunk_vectors]
+
+    record_ids = [str(r.id or uuid.uuid4()) for r in records]
+    now = datetime.utcnow()
+    rows = [
+        _record_values(r, record_id, embedding, query_embedding, now)
+        for r, record_id, embedding, query_embedding in zip(records, record_ids, embeddings, query_embeddings)
+    ]
+    statuses = ["duplicate"] * len(records)
+    # Upserts go in their own statements: those that carry an id replace that
+    # row, the rest the row with their query. Each key may appear only once per
+    # statement, so the last upsert for it wins and every other record with
+    # that key in the batch counts as a duplicate
+    by_id = {str(r.id): i for i, r in enumerate(records) if r.upsert and r.id}
+    by_query = {r.query: i for i, r in enumerate(records) if r.upsert and not r.id}
+    plain = [i for i, r in enumerate(records) if not r.upsert and r.query not in by_query]
+    async with pooled_conn() as conn, conn.cursor() as cur:
+        if plain:
+            await cur.execute(*_insert_sql([rows[i] for i in plain]))
+            inserted = {str(row[0]) for row in await cur.fetchall()}
+            for i in plain:
+                if record_ids[i] in inserted:
+                    statuses[i] = "inserted"
+        for upsert_on, latest in (("id", by_id), ("query", by_query)):
+            if not latest:
+                continue
+            await cur.execute(*_insert_sql([rows[i] for i in sorted(latest.values())], upsert_on))
+            for stored_id, query_text, was_inserted in await cur.fetchall():
+                i = latest[str(stored_id) if upsert_on == "id" else query_text]
+                record_ids[i] = str(stored_id)
+                statuses[i] = "inserted" if was_inserted else "updated"
+        if STORE_CHUNKS:
+            for i, status in enumerate(statuses):
+                if status != "duplicate":
+                    await _store_chunks(cur, record_ids[i], per_record[i], chunk_vectors[i],
+                                        replace=status == "updated")
+
+    index = get_index()
+    if index is not None:
+        for r, record_id, query_embedding, status in zip(records, record_ids, query_embeddings, statuses):
+            if status == "inserted" or (status == "updated" and not r.id):
+                index.add(record_id, r.query, query_embedding)
+
+    results = [{"id": str(r.id or ""), "query": r.query, "status": "invalid"} for r in body.records]
+    for i, r, record_id, status in zip(valid, records, record_ids, statuses):
+        results[i] = {"id": record_id, "query": r.query, "status": status}
+    return {
+        "results": results,
+        "inserted": statuses.count("inserted"),
+        "updated": statuses.count("updated"),
+        "duplicates": statuses.count("duplicate"),
+        "invalid": len(body.records) - len(records),
+        "timestamp": now,
+    }
 
-        # 2️⃣ run the fuzzy-search query
-        cur.execute(
-            """
+# Record columns that /record and /records can project
+RECORD_FIELDS = ("summarizer_output", "entity_output", "scraper_output", "websearch_output")
+# Columns inlined on /query hits when include_record is set. scraper_output is
+# left out on purpose: it is the whole article corpus and no cache hit uses it.
+INLINE_RECORD_COLUMNS = ("summarizer_output", "entity_output", "websearch_output")
+
+
+def _record_cols_sql(fields) -> str:
+    """`, col, ...` select-list suffix for the given record fields (plus *_z companions)."""
+    return "".join(f", {col}" for col in compression.select_columns(fields))
+
+
+def _parse_fields(fields: Optional[List[str]]) -> tuple:
+    """Validate a field projection; None/empty means every record field."""
+    if not fields:
+        return RECORD_FIELDS
+    unknown = sorted(set(fields) - set(RECORD_FIELDS))
+    if unknown:
+        raise HTTPException(400, f"Unknown fields {unknown}; expected a subset of {list(RECORD_FIELDS)}")
+    return tuple(col for col in RECORD_FIELDS if col in fields)
+
+
+def _trigram_sql(record_cols: str) -> str:
+    # pg_trgm.similarity_threshold is set once per pooled connection (db_utils)
+    return f"""
+        SELECT  id,
+                query,
+                similarity(query, %(q)s) AS score,
+                timestamp,
+                category
+                {record_cols}
+        FROM    query_embeddings
+        WHERE   query %% %(q)s        -- note the double %% !
+        ORDER BY score DESC
+        LIMIT   %(k)s;
+    """
+
+
+def _vector_sql(record_cols: str) -> str:
+    # ORDER BY the raw distance so the HNSW / IVFFlat index is used;
+    # the threshold is applied to the already-limited result.
+    return f"""
+        SELECT * FROM (
             SELECT  id,
                     query,
-                    similarity(query, %s) AS score
+                    1 - (query_embedding <=> %(v)s::vector) AS score,
+                    timestamp,
+                    category
+                    {record_cols}
             FROM    query_embeddings
-            WHERE   query %% %s        -- note the double %% !
-            ORDER BY score DESC
-            LIMIT   %s;
-            """,
-            (body.query, body.query, body.top_k),
+            ORDER BY query_embedding <=> %(v)s::vector
+            LIMIT   %(k)s
+        ) hits
+        WHERE score >= %(min)s
+        ORDER BY score DESC;
+    """
+
+
+def _hybrid_sql(record_cols: str) -> str:
+    # Candidates come from both indexes, then are re-scored on the combined metric
+    return f"""
+        WITH vec AS (
+            SELECT id FROM query_embeddings
+            ORDER BY query_embedding <=> %(v)s::vector
+            LIMIT %(n)s
+        ), trg AS (
+            SELECT id FROM query_embeddings
+            WHERE query %% %(q)s
+            ORDER BY similarity(query, %(q)s) DESC
+            LIMIT %(n)s
+        ), scored AS (
+            -- Rows stored before query_embedding existed are scored on trigrams alone
+            SELECT  e.*,
+                    CASE WHEN e.query_embedding IS NULL THEN similarity(e.query, %(q)s)
+                         ELSE %(w)s * (1 - (e.query_embedding <=> %(v)s::vector))
+                              + (1 - %(w)s) * similarity(e.query, %(q)s)
+                    END AS score
+            FROM    query_embeddings e
+            WHERE   e.id IN (SELECT id FROM vec UNION SELECT id FROM trg)
+        )
+        SELECT  id, query, score, timestamp, category {record_cols}
+        FROM    scored
+        WHERE   score >= %(min)s
+        ORDER BY score DESC
+        LIMIT   %(k)s;
+    """
+
+
+async def _query_memory_index(index, embedding, body: QueryBody, min_score: float) -> dict:
+    """Answer a vector-mode probe from the in-process index."""
+    found = index.search(embedding, body.top_k, min_score)
+    records, meta = {}, {}
+    if found:
+        # Records and freshness metadata are not kept in memory; fetch just the hits by primary key
+        record_cols = _record_cols_sql(INLINE_RECORD_COLUMNS) if body.include_record else ""
+        async with pooled_conn() as conn, conn.cursor() as cur:
+            await cur.execute(
+                f"SELECT id, timestamp, category {record_cols} FROM query_embeddings WHERE id = ANY(%s)",
+                ([uuid.UUID(record_id) for record_id, _, _ in found],),
+            )
+            for row in await cur.fetchall():
+                meta[str(row[0])] = {"timestamp": row[1], "category": row[2]}
+                if body.include_record:
+                    records[str(row[0])] = compression.decode_row(INLINE_RECORD_COLUMNS, row[3:])
+        # Rows deleted since the last prune are no longer hits; drop them from the index now
+        for record_id in [record_id for record_id, _, _ in found if record_id not in meta]:
+            index.remove(record_id)
+        found = [hit for hit in found if hit[0] in meta]
+    hits = [
+        QueryHit(
+            id=record_id,
+            query=query_text,
+            score=score,
+            **meta[record_id],
+            record=RecordResponse(query=query_text, **records[record_id]) if record_id in records else None,
         )
-        rows = cur.fetchall()
+        for record_id, query_text, score in found
+    ]
+    return {"hits": hits, "mode": body.mode}
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(body: QueryBody):
+    record_cols = _record_cols_sql(INLINE_RECORD_COLUMNS) if body.include_record else ""
+    params = {"q": body.query, "k": body.top_k}
+
+    if body.mode == "trigram":
+        sql = _trigram_sql(record_cols)
+    else:
+        embedding = await embed_text(body.query)
+        if len(embedding) != VECTOR_DIM:
+            raise HTTPException(500, "Unexpected embedding dimension")
+        params["v"] = to_vector(embedding)
+        index = get_index()
+        if body.mode == "vector" and index is not None:
+            min_score = SIM_THRESHOLD if body.min_score is None else body.min_score
+            return await _query_memory_index(index, embedding, body, min_score)
+        if body.mode == "vector":
+            sql = _vector_sql(record_cols)
+            params["min"] = SIM_THRESHOLD if body.min_score is None else body.min_score
+        else:
+            sql = _hybrid_sql(record_cols)
+            params["min"] = HYBRID_SIM_THRESHOLD if body.min_score is None else body.min_score
+            params["w"] = HYBRID_VECTOR_WEIGHT
+            params["n"] = body.top_k * HYBRID_CANDIDATES
+
+    async with pooled_conn() as conn, conn.cursor() as cur:
+        await cur.execute(sql, params)
+        rows = await cur.fetchall()
 
     hits = [
-        QueryHit(id=str(row[0]), query=row[1], score=float(row[2]))
+        QueryHit(
+            id=str(row[0]),
+            query=row[1],
+            score=float(row[2]),
+            timestamp=row[3],
+            category=row[4],
+            record=RecordResponse(
+                query=row[1],
+                **compression.decode_row(INLINE_RECORD_COLUMNS, row[5:]),
+            ) if body.include_record else None,
+        )
         for row in rows
     ]
-    return {"hits": hits}
-
-
-@app.get("/record/{record_id}", response_model=RecordResponse)
-def get_record(record_id: uuid.UUID):
-    """Retrieve a specific record by its UUID."""
-    with get_pg_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT query, summarizer_output, entity_output, scraper_output, websearch_output
-            FROM query_embeddings
-            WHERE id = %s
-            """,
-            (str(record_id),),
+    return {"hits": hits, "mode": body.mode}
+
+
+@app.get("/record/{record_id}", response_model=RecordResponse, response_model_exclude_unset=True)
+async def get_record(
+    record_id: uuid.UUID,
+    fields: Optional[str] = Query(None, description="comma-separated record fields to return (default: all)"),
+):
+    """Retrieve a specific record by its UUID, optionally only some of its fields."""
+    cols = _parse_fields([f.strip() for f in fields.split(",") if f.strip()] if fields else None)
+    async with pooled_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            f"SELECT query {_record_cols_sql(cols)} FROM query_embeddings WHERE id = %s",
+            (record_id,),
         )
-        row = cur.fetchone()
+        row = await cur.fetchone()
 
     if not row:
         raise HTTPException(status_code=404, detail="Record not found")
 
-    return RecordResponse(
-        query=row[0],
-        summarizer_output=row[1],
-        entity_output=row[2],
-        scraper_output=row[3],
-        websearch_output=row[4]
-    )
+    return RecordResponse(query=row[0], **compression.decode_row(cols, row[1:]))
+
+
+@app.post("/records", response_model=RecordsResponse, response_model_exclude_unset=True)
+async def get_records(body: RecordsBody):
+    """Bulk lookup of records by id, with the same field projection as /record."""
+    cols = _parse_fields(body.fields)
+    async with pooled_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            f"SELECT id, query {_record_cols_sql(cols)} FROM query_embeddings WHERE id = ANY(%s)",
+            (body.ids,),
+        )
+        rows = await cur.fetchall()
+
+    records = {
+        str(row[0]): RecordResponse(query=row[1], **compression.decode_row(cols, row[2:]))
+        for row in rows
+    }
+    missing = [str(record_id) for record_id in body.ids if str(record_id) not in records]
+    return RecordsResponse(records=records, missing=missing)
+
+
+@app.post("/embed", response_model=EmbedResponse)
+async def embed(body: EmbedBody):
+    """Embed many texts at once (cached, batched); used for bulk ingest and re-indexing."""
+    return {"model": OLLAMA_MODEL, "embeddings": await embed_texts(body.texts)}
 
 
 @app.get("/healthz")
@@ -194,6 +615,12 @@ def health():
     return {"ok": True}
 
 
+@app.get("/metrics")
+def metrics():
+    update_pool_metrics()
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     # Example usage
     # ... (omitted for brevity)
@@ -0,0 +1,191 @@
+"""
+In-process vector index for sub-millisecond cache probes.
+
+All stored query embeddings are kept L2-normalized in one contiguous float32 NumPy
+matrix, so a cosine search is a single matrix-vector product. Postgres stays
+the durable store: the index is loaded from it at startup, updated in place
+on /vectorize, and periodically synced so rows written by other workers show
+up too.
+
+Row timestamps are taken by the writer before its transaction commits, so a
+row can become visible after a later-stamped one was already synced. Each
+sync therefore re-scans MEMORY_INDEX_SYNC_OVERLAP seconds behind the newest
+timestamp seen (re-adding a row is idempotent). Deleted rows are dropped by a
+full id sweep every MEMORY_INDEX_PRUNE seconds.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db_utils import pooled_conn
+from metrics import MEMINDEX_BYTES, MEMINDEX_REBUILD_SECONDS, MEMINDEX_ROWS
+
+MEMORY_INDEX = os.getenv("MEMORY_INDEX", "0").lower() in ("1", "true", "yes")
+MEMORY_INDEX_SYNC = float(os.getenv("MEMORY_INDEX_SYNC", 60))  # seconds between syncs
+# How far behind the newest seen timestamp each sync looks again; must exceed
+# the longest time between a writer stamping a row and committing it
+MEMORY_INDEX_SYNC_OVERLAP = float(os.getenv("MEMORY_INDEX_SYNC_OVERLAP", 300))
+MEMORY_INDEX_PRUNE = float(os.getenv("MEMORY_INDEX_PRUNE", 3600))  # seconds between deletion sweeps
+
+
+class MemoryIndex:
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._queries: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._last_ts: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes
+
+    def _normalize(self, vec) -> np.ndarray:
+        arr = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr
+
+    def add(self, record_id: str, query: str, embedding, ts: Optional[datetime] = None) -> None:
+        """Insert or replace one vector."""
+        vec = self._normalize(embedding)
+        row = self._rows.get(record_id)
+        if row is None:
+            if self._size == len(self._matrix):
+                # Grow geometrically so appends are amortized O(1)
+                grown = np.zeros((max(1024, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+                grown[: self._size] = self._matrix[: self._size]
+                self._matrix = grown
+            row = self._size
+            self._size += 1
+            self._ids.append(record_id)
+            self._queries.append(query)
+            self._rows[record_id] = row
+        else:
+            self._queries[row] = query
+        self._matrix[row] = vec
+        if ts is not None and (self._last_ts is None or ts > self._last_ts):
+            self._last_ts = ts
+        self._report()
+
+    def remove(self, record_id: str) -> None:
+        """Drop one vector; the last row moves into its slot."""
+        row = self._rows.pop(record_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = self._ids[last]
+            self._queries[row] = self._queries[last]
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._queries.pop()
+        self._matrix[last] = 0
+        self._size = last
+        self._report()
+
+    def search(self, embedding, top_k: int, min_score: float) -> List[Tuple[str, str, float]]:
+        """Return up to top_k (id, query, cosine score) with score >= min_score."""
+        if not self._size:
+            return []
+        scores = self._matrix[: self._size] @ self._normalize(embedding)
+        k = min(top_k, self._size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self._ids[i], self._queries[i], float(scores[i]))
+            for i in top
+            if scores[i] >= min_score
+        ]
+
+    async def sync(self) -> int:
+        """Load rows stamped within the overlap window or later (all rows on first call)."""
+        since = None if self._last_ts is None else self._last_ts - timedelta(seconds=MEMORY_INDEX_SYNC_OVERLAP)
+        t0 = time.perf_counter()
+        async with pooled_conn() as conn, conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT id, query, query_embedding::float4[], timestamp
+                FROM query_embeddings
+                WHERE query_embedding IS NOT NULL
+                  AND (%(ts)s::timestamptz IS NULL OR timestamp > %(ts)s)
+                ORDER BY timestamp
+                """,
+                {"ts": since},
+            )
+            rows = await cur.fetchall()
+        for record_id, query, embedding, ts in rows:
+            self.add(str(record_id), query, embedding, ts)
+        if rows:
+            MEMINDEX_REBUILD_SECONDS.set(time.perf_counter() - t0)
+        return len(rows)
+
+    async def prune(self) -> int:
+        """Drop vectors whose row no longer exists (or lost its query embedding)."""
+        async with pooled_conn() as conn, conn.cursor() as cur:
+            await cur.execute("SELECT id FROM query_embeddings WHERE query_embedding IS NOT NULL")
+            live = {str(row[0]) for row in await cur.fetchall()}
+        gone = [record_id for record_id in self._ids if record_id not in live]
+        for record_id in gone:
+            self.remove(record_id)
+        return len(gone)
+
+    def _report(self) -> None:
+        MEMINDEX_ROWS.set(self._size)
+        MEMINDEX_BYTES.set(self.nbytes)
+
+
+_index: Optional[MemoryIndex] = None
+_sync_task: Optional[asyncio.Task] = None
+
+
+def get_index() -> Optional[MemoryIndex]:
+    """The loaded index, or None when MEMORY_INDEX is off."""
+    return _index
+
+
+async def _sync_loop() -> None:
+    last_prune = time.monotonic()
+    while True:
+        await asyncio.sleep(MEMORY_INDEX_SYNC)
+        try:
+            await _index.sync()
+            if time.monotonic() - last_prune >= MEMORY_INDEX_PRUNE:
+                last_prune = time.monotonic()
+                removed = await _index.prune()
+                if removed:
+                    print(f"[VECTORSTORE] memory index dropped {removed} deleted rows")
+        except Exception as exc:
+            print(f"[VECTORSTORE] memory index sync failed: {exc}")
+
+
+async def load_index(dim: int) -> None:
+    """Build the index from Postgres (called at app startup if enabled)."""
+    global _index, _sync_task
+    if not MEMORY_INDEX:
+        return
+    _index = MemoryIndex(dim)
+    t0 = time.perf_counter()
+    loaded = await _index.sync()
+    elapsed = time.perf_counter() - t0
+    MEMINDEX_REBUILD_SECONDS.set(elapsed)
+    print(f"[VECTORSTORE] memory index loaded {loaded} vectors "
+          f"({_index.nbytes / 2**20:.1f} MiB) in {elapsed:.2f}s")
+    _sync_task = asyncio.ensure_future(_sync_loop())
+
+
+async def unload_index() -> None:
+    global _index, _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        _sync_task = None
+    _index = None
@@ -0,0 +1,47 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+PG_POOL_OPEN = Gauge(
+    "vectorstore_pg_pool_connections",
+    "Postgres connections currently open in the pool"
+)
+PG_POOL_IN_USE = Gauge(
+    "vectorstore_pg_pool_in_use",
+    "Postgres connections currently checked out"
+)
+PG_POOL_WAITING = Gauge(
+    "vectorstore_pg_pool_waiting",
+    "Requests waiting for a Postgres connection"
+)
+PG_POOL_WAIT = Histogram(
+    "vectorstore_pg_pool_wait_seconds",
+    "Time spent waiting to check out a Postgres connection"
+)
+PG_POOL_HEALTHCHECK_FAILURES = Counter(
+    "vectorstore_pg_pool_healthcheck_failures_total",
+    "Pooled connections discarded because they failed a health check"
+)
+MEMINDEX_ROWS = Gauge(
+    "vectorstore_memindex_vectors",
+    "Vectors held in the in-process index"
+)
+MEMINDEX_BYTES = Gauge(
+    "vectorstore_memindex_bytes",
+    "Memory allocated for the in-process index matrix"
+)
+MEMINDEX_REBUILD_SECONDS = Gauge(
+    "vectorstore_memindex_rebuild_seconds",
+    "Duration of the last in-process index load/sync that found new rows"
+)
+EMBED_CACHE_HITS = Counter(
+    "vectorstore_embed_cache_hits_total",
+    "Embeddings served from cache instead of Ollama",
+    ["layer"]
+)
+EMBED_CACHE_MISSES = Counter(
+    "vectorstore_embed_cache_misses_total",
+    "Embeddings that had to be computed by Ollama"
+)
+EMBED_REQUESTS = Counter(
+    "vectorstore_embed_requests_total",
+    "Batched embedding calls sent to Ollama"
+)
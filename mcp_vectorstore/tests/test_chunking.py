@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import chunking
+import main
+from chunking import build_chunks, pool_vectors, split_text
+
+
+def test_short_and_blank_text():
+    assert split_text("  hello  ", size=10) == ["hello"]
+    assert split_text(" \n ", size=10) == []
+
+
+def test_split_prefers_sentence_ends_and_overlaps():
+    text = "First sentence here. Second sentence here. Third one."
+    chunks = split_text(text, size=25, overlap=5)
+    assert all(len(c) <= 25 for c in chunks)
+    assert chunks[0] == "First sentence here."
+    assert chunks[-1].endswith("Third one.")
+    assert all(part in " ".join(chunks) for part in ("First", "Second", "Third"))
+
+
+def test_chunks_are_capped(monkeypatch):
+    monkeypatch.setattr(chunking, "MAX_CHUNKS", 3)
+    chunks = build_chunks("q", None, None, "x. " * 5000, "summary", None, None)
+    assert [field for field, _ in chunks] == ["query", "summary", "scraper"]
+
+
+def test_pool_vectors_normalizes_before_averaging():
+    pooled = pool_vectors([[10.0, 0.0], [0.0, 1.0]])
+    assert pooled == pytest.approx([np.sqrt(0.5), np.sqrt(0.5)])
+    assert pool_vectors([[0.0, 0.0]]) == [0.0, 0.0]
+
+
+def test_pool_vectors_rejects_empty_input():
+    with pytest.raises(ValueError):
+        pool_vectors([])
+
+
+def test_blank_query_is_rejected_before_embedding():
+    response = TestClient(main.app).post("/vectorize", json={"query": " \t "})
+    assert response.status_code == 422
+    assert "query must not be blank" in response.text
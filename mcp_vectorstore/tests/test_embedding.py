@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import embedding
+from embedding import _DiskCache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_caches(monkeypatch):
+    monkeypatch.setattr(embedding, "_memory", embedding.OrderedDict())
+    monkeypatch.setattr(embedding, "_inflight", {})
+    monkeypatch.setattr(embedding, "_disk", None)
+    monkeypatch.setattr(embedding, "EMBED_CACHE_PATH", "")
+
+
+def test_concurrent_identical_misses_share_one_ollama_call(monkeypatch):
+    calls = []
+
+    async def fake_embed(texts):
+        calls.append(list(texts))
+        await asyncio.sleep(0.01)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    monkeypatch.setattr(embedding, "_ollama_embed", fake_embed)
+
+    async def run():
+        return await asyncio.gather(
+            embedding.embed_texts(["same", "other"]),
+            embedding.embed_texts(["same"]),
+            embedding.embed_texts(["same", "other"]),
+        )
+
+    first, second, third = asyncio.run(run())
+    assert calls == [["same", "other"]]
+    assert first == third == [[4.0, 1.0], [5.0, 1.0]]
+    assert second == [[4.0, 1.0]]
+    assert embedding._inflight == {}
+
+
+def test_waiter_survives_the_first_caller_being_cancelled(monkeypatch):
+    async def fake_embed(texts):
+        await asyncio.sleep(0.02)
+        return [[1.0] for _ in texts]
+
+    monkeypatch.setattr(embedding, "_ollama_embed", fake_embed)
+
+    async def run():
+        owner = asyncio.ensure_future(embedding.embed_texts(["q"]))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(embedding.embed_texts(["q"]))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == [[1.0]]
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding, "_DISK_CHECK_EVERY", 1)
+    disk = _DiskCache(str(tmp_path / "embeddings.db"), max_rows=10)
+    disk.put_many({("m", str(i)): [float(i)] for i in range(10)})
+    assert disk.get_many([("m", "0")]) == {("m", "0"): [0.0]}  # now the most recent
+    disk.put_many({("m", "new"): [42.0]})
+
+    kept = disk.get_many([("m", str(i)) for i in range(10)] + [("m", "new")])
+    disk.close()
+    assert len(kept) == 9
+    assert ("m", "0") in kept and ("m", "new") in kept
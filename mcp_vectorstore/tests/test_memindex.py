@@ -0,0 +1,125 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import main
+import memindex
+from memindex import MemoryIndex
+
+
+def _vec(*head, dim=4):
+    return list(head) + [0.0] * (dim - len(head))
+
+
+def test_search_ranks_by_cosine_and_applies_threshold():
+    index = MemoryIndex(4)
+    index.add("a", "qa", _vec(1, 0))
+    index.add("b", "qb", _vec(1, 1))
+    index.add("c", "qc", _vec(0, 1))
+    hits = index.search(_vec(2, 0), top_k=3, min_score=0.5)
+    assert [h[0] for h in hits] == ["a", "b"]
+    assert hits[0][2] == pytest.approx(1.0)
+
+
+def test_add_replaces_existing_id():
+    index = MemoryIndex(4)
+    index.add("a", "old", _vec(1, 0))
+    index.add("a", "new", _vec(0, 1))
+    assert len(index) == 1
+    assert index.search(_vec(0, 1), 1, 0.9) == [("a", "new", pytest.approx(1.0))]
+
+
+def test_remove_moves_last_row_into_the_gap():
+    index = MemoryIndex(4)
+    for i, name in enumerate("abc"):
+        index.add(name, f"q{name}", _vec(*([0] * i + [1])))
+    index.remove("a")
+    index.remove("missing")
+    assert len(index) == 2
+    assert index.search(_vec(0, 0, 1), 1, 0.9)[0][0] == "c"
+    assert index.search(_vec(0, 1), 1, 0.9)[0][0] == "b"
+    assert index.search(_vec(1), 1, 0.5) == []
+
+
+class _FakeDB:
+    """Stands in for pooled_conn(): answers sync, prune and hit lookups from `rows`."""
+
+    def __init__(self):
+        self.rows = []  # (id, query, vector, ts)
+        self.params = []
+
+    @asynccontextmanager
+    async def conn(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        self.params.append(params)
+        if "WHERE id = ANY" in sql:
+            wanted = {str(record_id) for record_id in params[0]}
+            self._result = [r for r in self.rows if r[0] in wanted]
+        elif "SELECT id FROM" in sql:
+            self._result = [(r[0],) for r in self.rows]
+        else:
+            since = (params or {}).get("ts")
+            self._result = [r for r in self.rows if since is None or r[3] > since]
+
+    async def fetchall(self):
+        return self._result
+
+
+def test_sync_rescans_overlap_window_for_late_commits(monkeypatch):
+    db = _FakeDB()
+    monkeypatch.setattr(memindex, "pooled_conn", db.conn)
+    monkeypatch.setattr(memindex, "MEMORY_INDEX_SYNC_OVERLAP", 60)
+    t0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    index = MemoryIndex(4)
+
+    db.rows = [("late-stamped", "q1", _vec(1), t0 + timedelta(seconds=10))]
+    assert asyncio.run(index.sync()) == 1
+    # A row stamped earlier commits only now; a plain "timestamp > last" watermark would miss it
+    db.rows.append(("early-stamped", "q2", _vec(0, 1), t0 + timedelta(seconds=5)))
+    asyncio.run(index.sync())
+    assert db.params[-1]["ts"] == t0 + timedelta(seconds=10) - timedelta(seconds=60)
+    assert len(index) == 2
+
+
+def test_prune_drops_deleted_rows(monkeypatch):
+    db = _FakeDB()
+    monkeypatch.setattr(memindex, "pooled_conn", db.conn)
+    ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    db.rows = [("a", "qa", _vec(1), ts), ("b", "qb", _vec(0, 1), ts)]
+    index = MemoryIndex(4)
+    asyncio.run(index.sync())
+    db.rows = db.rows[1:]  # "a" deleted by someone else
+    assert asyncio.run(index.prune()) == 1
+    assert len(index) == 1
+    assert index.search(np.array(_vec(1, 1)), 2, 0.0)[0][0] == "b"
+
+
+def test_hits_deleted_since_the_last_prune_are_dropped(monkeypatch):
+    live, deleted = "00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000002"
+    ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    db = _FakeDB()
+    db.rows = [(live, ts, "news")]
+    monkeypatch.setattr(main, "pooled_conn", db.conn)
+    index = MemoryIndex(4)
+    index.add(live, "flood warning", _vec(1))
+    index.add(deleted, "flood warnings", _vec(1))
+
+    body = main.QueryBody(query="flood warning", mode="vector")
+    out = asyncio.run(main._query_memory_index(index, _vec(1), body, 0.5))
+    assert [hit.id for hit in out["hits"]] == [live]
+    assert out["hits"][0].category == "news"
+    assert len(index) == 1
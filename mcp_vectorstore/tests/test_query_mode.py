@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import main
+from calibrate_threshold import suggest, sweep
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_main(query_mode):
+    env = {**os.environ, "QUERY_MODE": query_mode}
+    return subprocess.run([sys.executable, "-c", "import main"], cwd=SERVICE_DIR, env=env,
+                          capture_output=True, text=True)
+
+
+def test_unknown_query_mode_fails_at_startup():
+    proc = _import_main("vectr")
+    assert proc.returncode != 0
+    assert "QUERY_MODE must be one of" in proc.stderr
+
+
+def test_known_query_mode_starts():
+    assert _import_main("hybrid").returncode == 0
+
+
+def test_threshold_sweep_and_suggestion():
+    scores = np.array([0.95, 0.91, 0.88, 0.80, 0.70, 0.60])
+    labels = np.array([True, True, True, False, True, False])
+    rows = sweep(scores, labels, [0.6, 0.7, 0.8, 0.85, 0.9])
+    by_t = {r["threshold"]: r for r in rows}
+    assert by_t[0.85] == {"threshold": 0.85, "precision": 1.0, "recall": 0.75}
+    assert by_t[0.6]["recall"] == 1.0 and by_t[0.6]["precision"] == 4 / 6
+    threshold, row = suggest(rows, 0.95)
+    assert threshold == 0.85 and row["recall"] == 0.75
+
+
+def test_hybrid_scores_rows_without_a_query_vector_on_trigrams():
+    sql = " ".join(main._hybrid_sql("").split())
+    assert "CASE WHEN e.query_embedding IS NULL THEN similarity(e.query, %(q)s)" in sql
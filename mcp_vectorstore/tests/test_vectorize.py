@@ -0,0 +1,116 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+class _FakeDB:
+    """Stands in for pooled_conn(): records statements and reports every row as inserted."""
+
+    def __init__(self):
+        self.statements = []
+
+    @asynccontextmanager
+    async def conn(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+        cols = [c.strip() for c in sql.split("(", 1)[1].split(")", 1)[0].split(",")]
+        rows = [dict(zip(cols, params[i:i + len(cols)])) for i in range(0, len(params), len(cols))]
+        self._rows = [(row["id"], row["query"], True) for row in rows]
+
+    async def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    async def fetchall(self):
+        return self._rows
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = _FakeDB()
+    embedded = []
+
+    async def embed_texts(texts):
+        embedded.extend(texts)
+        return [[1.0] + [0.0] * (main.VECTOR_DIM - 1) for _ in texts]
+
+    monkeypatch.setattr(main, "pooled_conn", db.conn)
+    monkeypatch.setattr(main, "embed_texts", embed_texts)
+    monkeypatch.setattr(main, "STORE_CHUNKS", False)
+    db.embedded = embedded
+    return db
+
+
+def test_blank_record_is_reported_without_failing_the_batch(db):
+    records = [
+        {"id": "00000000-0000-0000-0000-000000000001", "query": "real query"},
+        {"id": "00000000-0000-0000-0000-000000000002", "query": "   "},
+    ]
+    response = TestClient(main.app).post("/vectorize_batch", json={"records": records})
+    assert response.status_code == 200
+    out = response.json()
+    assert [r["status"] for r in out["results"]] == ["inserted", "invalid"]
+    assert out["results"][1]["id"] == records[1]["id"]
+    assert out["inserted"] == 1 and out["invalid"] == 1
+    assert "   " not in db.embedded
+
+
+def test_empty_record_is_reported_without_failing_the_batch(db):
+    records = [{"query": ""}, {"query": "real query"}]
+    response = TestClient(main.app).post("/vectorize_batch", json={"records": records})
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["invalid", "inserted"]
+    assert "" not in db.embedded
+
+
+def test_empty_query_is_rejected_by_vectorize():
+    assert TestClient(main.app).post("/vectorize", json={"query": ""}).status_code == 422
+
+
+def test_all_text_does_not_duplicate_the_large_columns():
+    body = main.VectorizeBody(
+        query="flood warning", tags=["weather"], summarizer_output="Rivers rising.",
+        scraper_output="full article " * 1000, websearch_output={"most_relevant": [{"title": "t"}]},
+    )
+    text = main._all_text(body)
+    assert text == "flood warning weather Rivers rising."
+
+
+def test_refresh_of_a_fuzzy_hit_upserts_on_the_id(db):
+    # The stale hit was stored as "flood warning london"; the caller asked "london flood warning"
+    body = {"id": "00000000-0000-0000-0000-0000000000aa", "query": "london flood warning", "upsert": True}
+    response = TestClient(main.app).post("/vectorize", json=body)
+    assert response.status_code == 200
+    sql, _ = db.statements[-1]
+    assert "ON CONFLICT (id) DO UPDATE" in sql
+    assert "query = EXCLUDED.query" not in sql and "query_embedding = EXCLUDED" not in sql
+
+
+def test_batch_upserts_split_by_conflict_key(db):
+    records = [
+        {"id": "00000000-0000-0000-0000-0000000000aa", "query": "refreshed wording", "upsert": True},
+        {"query": "replace by query", "upsert": True},
+    ]
+    response = TestClient(main.app).post("/vectorize_batch", json={"records": records})
+    assert [r["status"] for r in response.json()["results"]] == ["inserted", "inserted"]
+    conflicts = [sql.split("ON CONFLICT", 1)[1].split(")")[0] for sql, _ in db.statements]
+    assert conflicts == [" (id", " (query"]
+
+
+def test_trace_id_is_logged(db, capsys):
+    TestClient(main.app).post("/vectorize", json={"query": "q"}, headers={"X-Trace-Id": "fedcba9876543210"})
+    out = capsys.readouterr().out
+    assert "POST /vectorize 200" in out and "trace=fedcba98" in out
@@ -1,4 +1,10 @@
 import re
+from urllib.parse import urlsplit
+
+# --- 0. Query Normalizer ---
+def normalize_query(query):
+    # Case- and whitespace-insensitive key for dedup / caching
+    return " ".join(query.lower().split())
 
 # --- 1. Classifier Adapter ---
 def classifier_to_query(cls_out, original_query):
@@ -10,17 +16,38 @@ def classifier_to_query(cls_out, original_query):
     }
 
 # --- 2. Search Adapter ---
-def search_to_urls(search_out):
+ARTICLES_PER_LIST = 5
+# Score the scraper gives a domain it has no history for
+UNKNOWN_DOMAIN_SCORE = 0.5
+
+def url_domain(url):
+    # Same key the scraper's /domains stats use
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def search_to_urls(search_out, domain_stats=None):
+    # Take top 5 from each, but avoid duplicates by URL.
+    # With scraper domain stats, domains whose breaker is open are skipped (the
+    # next result takes their place) and likelier successes are listed first.
+    domain_stats = domain_stats or {}
     urls = []
-    # Take top 5 from each, but avoid duplicates by URL
     seen = set()
     for key in ["most_relevant", "most_recent"]:
-        for art in search_out.get(key, [])[:5]:
+        taken = 0
+        for art in search_out.get(key, []):
+            if taken >= ARTICLES_PER_LIST:
+                break
             url = art.get("url")
             title = art.get("title", "")
-            if url and url not in seen:
-                urls.append({"url": url, "title": title})
-                seen.add(url)
+            if not url or url in seen:
+                continue
+            if domain_stats.get(url_domain(url), {}).get("state") == "open":
+                continue
+            urls.append({"url": url, "title": title})
+            seen.add(url)
+            taken += 1
+    if domain_stats:
+        urls.sort(key=lambda a: -domain_stats.get(url_domain(a["url"]), {}).get("score", UNKNOWN_DOMAIN_SCORE))
     return {"articles": urls}
 
 # --- 3. Scraper Adapter ---
@@ -64,6 +91,12 @@ def entity_output_adapter(entity_raw):
     }
 
 
+def classifier_category(cls_out):
+    """Best-fit category: the classifier returns it first in `categories`."""
+    categories = cls_out.get("categories") or []
+    return cls_out.get("category") or (categories[0] if categories else "")
+
+
 # --- 6. Vectorizer Payload Assembler ---
 def assemble_vectorizer_payload(query, cls_out, scrape_out, sm_out, ent_out):
     """
@@ -72,7 +105,7 @@ def assemble_vectorizer_payload(query, cls_out, scrape_out, sm_out, ent_out):
     return {
         "query": query,
         "tags": cls_out.get("tags", []),
-        "category": cls_out.get("category", ""),
+        "category": classifier_category(cls_out),
         "scraper_output": scrape_out,         # Dict from scraper_to_corpus
         "summarizer_output": sm_out,          # Dict from summarizer_to_summary_text
         "entity_output": ent_out,             # Dict from entity_output_adapter
@@ -1,13 +1,28 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware # Import CORS
+from contextlib import asynccontextmanager
 import json
 
-from main import process_query   # Import from main.py in the same folder
+import http_clients as hc
+import tracing
+import writebehind
+from batch import run_batch, validate_limits
+from main import process_query, process_query_events   # Import from main.py in the same folder
 from metrics import start_metrics_server
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
-app = FastAPI(title="Orchestrator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive connection pool per MCP, shared by every call_* helper
+    await hc.open_sessions()
+    writebehind.start_worker()
+    yield
+    await writebehind.stop_worker(writebehind.SHUTDOWN_DRAIN)
+    await hc.close_sessions()
+    await tracing.close_exporter()
+
+app = FastAPI(title="Orchestrator", lifespan=lifespan)
 start_metrics_server(9000)
 
 # Add CORS middleware
@@ -32,13 +47,61 @@ def health():
 def metrics():
     return StreamingResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
-@app.post("/process", response_class=StreamingResponse)
+STREAM_MODES = ("ndjson", "sse")
+RETRY_AFTER = 5  # seconds, sent with 503 when an MCP queue is full
+
+@app.post("/process")
 async def process(payload: dict):
-    if "query" not in payload:
-        raise HTTPException(400, "Need JSON {'query': ...}")
+    # No up-front admission check: cache hits never touch most MCPs, so only the
+    # stage whose queue is actually full sheds the request (ServiceOverloaded -> 503)
+    query = payload.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise HTTPException(400, "Need JSON {'query': ...} with a non-blank query")
+
+    mode = payload.get("stream")
+    if mode and mode not in STREAM_MODES:
+        raise HTTPException(400, f"'stream' must be one of {STREAM_MODES}")
+
+    if mode == "ndjson":
+        # One JSON object per line, emitted as each stage completes
+        async def _stream_ndjson():
+            async for event in process_query_events(payload["query"]):
+                yield json.dumps(event) + "\n"
+
+        return StreamingResponse(_stream_ndjson(), media_type="application/x-ndjson")
+
+    if mode == "sse":
+        async def _stream_sse():
+            async for event in process_query_events(payload["query"]):
+                yield f"event: {event['stage']}\ndata: {json.dumps(event['data'])}\n\n"
+
+        return StreamingResponse(
+            _stream_sse(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    result = await process_query(payload["query"])
+    if result.get("overloaded"):
+        return JSONResponse(result, status_code=503, headers={"Retry-After": str(RETRY_AFTER)})
+    return JSONResponse(result)
+
+@app.post("/process_batch", response_class=StreamingResponse)
+async def process_batch(payload: dict):
+    queries = payload.get("queries")
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+        raise HTTPException(400, "Need JSON {'queries': ['...', ...]}")
+
+    limits = payload.get("limits") or {}
+    if not isinstance(limits, dict):
+        raise HTTPException(400, "'limits' must map stage names to positive integers")
+    try:
+        validate_limits(limits)
+    except ValueError as e:
+        raise HTTPException(400, f"'limits': {e}")
 
     async def _stream():
-        result = await process_query(payload["query"])
-        yield json.dumps(result)
+        async for item in run_batch(queries, limits):
+            yield json.dumps(item) + "\n"
 
-    return StreamingResponse(_stream(), media_type="application/json")
\ No newline at end of file
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
\ No newline at end of file
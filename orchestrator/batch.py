@@ -0,0 +1,148 @@
+"""
+Batch processing: run many queries through the pipeline at once.
+
+Queries are pipelined (each runs as its own task), while every stage has its
+own concurrency limit so e.g. many scrapes can be in flight but only as many
+LLM calls as Ollama can actually run in parallel. Results are yielded as each
+query finishes, not in input order.
+
+CLI:
+    python batch.py queries.jsonl [--max-inflight 64] [--limit summarizer=2 ...]
+
+The input file holds one query per line, either as plain text or as a JSON
+object with a "query" field. Results are written to stdout as NDJSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from typing import AsyncIterator, Dict, List, Optional
+
+import http_clients as hc
+import writebehind
+from main import STAGE_LIMITS, process_query
+
+STAGES = ("probe", "classifier", "search", "scraper", "summarizer", "entity", "vectorizer")
+
+# Defaults assume a single local Ollama instance; override with BATCH_LIMIT_<STAGE>
+DEFAULT_STAGE_LIMITS: Dict[str, int] = {
+    stage: int(os.getenv(f"BATCH_LIMIT_{stage.upper()}", default))
+    for stage, default in {
+        "probe": 32,
+        "classifier": 2,
+        "search": 8,
+        "scraper": 16,
+        "summarizer": 1,
+        "entity": 1,
+        "vectorizer": 8,
+    }.items()
+}
+BATCH_MAX_INFLIGHT = int(os.getenv("BATCH_MAX_INFLIGHT", 64))
+
+
+async def _run_one(index: int, query: str, sems: Dict[str, asyncio.Semaphore]) -> Dict:
+    # Each task has its own context copy, so this only applies to this query
+    STAGE_LIMITS.set(sems)
+    try:
+        result = await process_query(query)
+    except Exception as exc:
+        result = {"error": f"pipeline failed: {exc}"}
+    return {"index": index, "query": query, "result": result}
+
+
+async def run_batch(
+    queries: List[str],
+    limits: Optional[Dict[str, int]] = None,
+    max_inflight: int = BATCH_MAX_INFLIGHT,
+) -> AsyncIterator[Dict]:
+    """Yield {"index", "query", "result"} for each query as soon as it finishes."""
+    merged = {**DEFAULT_STAGE_LIMITS, **(limits or {})}
+    sems = {stage: asyncio.Semaphore(n) for stage, n in merged.items() if n > 0}
+
+    inflight = set()
+    try:
+        for index, query in enumerate(queries):
+            while len(inflight) >= max(max_inflight, 1):
+                done, inflight = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            inflight.add(asyncio.ensure_future(_run_one(index, query, sems)))
+
+        while inflight:
+            done, inflight = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Caller went away (e.g. client disconnected): stop the remaining queries.
+        # Cancelling a query unsubscribes it, which cancels its pipeline run
+        # unless another caller is waiting on the same query.
+        for task in inflight:
+            task.cancel()
+
+
+def validate_limits(limits: Dict) -> Dict[str, int]:
+    """
+    Check per-request stage limits: known stages, positive integers only.
+    (0 is rejected here; only BATCH_LIMIT_<STAGE>=0 means "no limit".)
+    """
+    for stage, n in limits.items():
+        if stage not in STAGES:
+            raise ValueError(f"unknown stage {stage!r}; expected one of {STAGES}")
+        if isinstance(n, bool) or not isinstance(n, int) or n < 1:
+            raise ValueError(f"limit for {stage!r} must be a positive integer, got {n!r}")
+    return limits
+
+
+def parse_limits(items: List[str]) -> Dict[str, int]:
+    """Parse ["stage=N", ...] into a limits dict, rejecting unknown stages and non-positive limits."""
+    limits = {}
+    for item in items:
+        stage, _, value = item.partition("=")
+        if not value.isdigit():
+            raise ValueError(f"bad stage limit {item!r}; expected <stage>=<int> with stage in {STAGES}")
+        limits[stage] = int(value)
+    return validate_limits(limits)
+
+
+def _read_queries(path: str) -> List[str]:
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                query = json.loads(line).get("query")
+                if query:
+                    queries.append(query)
+            else:
+                queries.append(line)
+    return queries
+
+
+async def _main(args: argparse.Namespace) -> None:
+    out = sys.stdout
+    queries = _read_queries(args.file)
+    # Pipeline logging goes to stderr so stdout stays clean NDJSON
+    with redirect_stdout(sys.stderr):
+        writebehind.start_worker()
+        try:
+            async for item in run_batch(queries, parse_limits(args.limit), args.max_inflight):
+                out.write(json.dumps(item) + "\n")
+                out.flush()
+        finally:
+            # Flush spooled records before exiting; leftovers are sent on the next start
+            await writebehind.stop_worker(writebehind.SHUTDOWN_DRAIN)
+            await hc.close_sessions()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a batch of queries through the pipeline.")
+    parser.add_argument("file", help="query file: one query per line, plain text or JSON with a 'query' field")
+    parser.add_argument("--max-inflight", type=int, default=BATCH_MAX_INFLIGHT,
+                        help="maximum number of queries in the pipeline at once")
+    parser.add_argument("--limit", action="append", default=[], metavar="STAGE=N",
+                        help=f"per-stage concurrency limit, stages: {', '.join(STAGES)}")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,60 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from metrics import L1_HITS, L1_MISSES, L1_EVICTIONS, L1_SIZE
+
+L1_CACHE_SIZE = int(os.getenv("L1_CACHE_SIZE", 1024))
+L1_CACHE_TTL = float(os.getenv("L1_CACHE_TTL", 600))  # seconds
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, name: str, maxsize: int = L1_CACHE_SIZE, ttl: float = L1_CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            L1_MISSES.labels(self.name).inc()
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            L1_SIZE.labels(self.name).set(len(self._data))
+            L1_MISSES.labels(self.name).inc()
+            return None
+        self._data.move_to_end(key)
+        L1_HITS.labels(self.name).inc()
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            L1_EVICTIONS.labels(self.name).inc()
+        L1_SIZE.labels(self.name).set(len(self._data))
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+        L1_SIZE.labels(self.name).set(len(self._data))
+
+    def clear(self) -> None:
+        self._data.clear()
+        L1_SIZE.labels(self.name).set(0)
+
+
+# Final /process results keyed on normalized query, and vectorstore records keyed on id
+QUERY_CACHE = TTLCache("query")
+RECORD_CACHE = TTLCache("record")
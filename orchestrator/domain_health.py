@@ -0,0 +1,42 @@
+"""
+Scraper domain health, as reported by the scraper's GET /domains.
+
+The stats are cached for DOMAIN_STATS_TTL seconds and refreshed in the
+background, so choosing scrape targets never waits on the scraper. Until the
+first refresh lands (or while the scraper is unreachable) nothing is known
+and search_to_urls keeps plain search order.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import http_clients as hc
+from tracing import log
+
+DOMAIN_STATS_TTL = float(os.getenv("DOMAIN_STATS_TTL", 30))  # seconds; 0 disables
+
+_stats: Dict[str, Dict] = {}
+_fetched_at = float("-inf")
+_task: Optional[asyncio.Task] = None
+
+
+async def _refresh() -> None:
+    global _stats, _fetched_at
+    try:
+        out = await hc.get_scraper_domains()
+    except Exception as e:
+        log.warning("scraper domain stats unavailable: %s", e)
+        out = {}
+    _stats = out.get("domains", {})
+    _fetched_at = time.monotonic()
+
+
+def current() -> Dict[str, Dict]:
+    """Last known stats per domain; starts a refresh when they are older than DOMAIN_STATS_TTL."""
+    global _task
+    if DOMAIN_STATS_TTL <= 0:
+        return {}
+    if time.monotonic() - _fetched_at >= DOMAIN_STATS_TTL and (_task is None or _task.done()):
+        _task = asyncio.ensure_future(_refresh())
+    return _stats
@@ -0,0 +1,54 @@
+"""
+Per-category freshness of cached vectorstore records.
+
+A cache hit older than its category's TTL is still served (stale-while-
+revalidate), but triggers a background pipeline run that upserts the record.
+TTLs are in seconds; 0 means the category never goes stale.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Categories produced by the classifier. Fast-moving stories (trials, politics,
+# protests) go stale sooner than settled ones.
+DEFAULT_RECORD_TTLS: Dict[str, float] = {
+    "legal":    86400,
+    "politics": 86400,
+    "protest":  86400,
+    "crime":    3 * 86400,
+    "accident": 7 * 86400,
+    "other":    7 * 86400,
+}
+# Fallback for uncategorised records; override per category with RECORD_TTL_<CATEGORY>
+RECORD_TTL = float(os.getenv("RECORD_TTL", 7 * 86400))
+RECORD_TTLS = {
+    category: float(os.getenv(f"RECORD_TTL_{category.upper()}", ttl))
+    for category, ttl in DEFAULT_RECORD_TTLS.items()
+}
+
+
+def ttl_for(category: Optional[str]) -> float:
+    if not category:
+        return RECORD_TTL
+    category = category.lower()
+    return RECORD_TTLS.get(category, float(os.getenv(f"RECORD_TTL_{category.upper()}", RECORD_TTL)))
+
+
+def age_seconds(timestamp: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """Age of an ISO-8601 timestamp from the vectorstore (naive means UTC); None if unparseable."""
+    if not timestamp:
+        return None
+    try:
+        ts = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ((now or datetime.now(timezone.utc)) - ts).total_seconds()
+
+
+def is_stale(hit: Dict) -> bool:
+    """Whether a /query hit (with timestamp and category) is past its category's TTL."""
+    ttl = ttl_for(hit.get("category"))
+    age = age_seconds(hit.get("timestamp"))
+    return ttl > 0 and age is not None and age > ttl
@@ -1,79 +1,238 @@
 import asyncio
 import json
-from typing import Any, Dict
+import os
+import time
+from typing import Any, Dict, List, Optional
 import aiohttp
 
+import tracing
+from metrics import MCP_INFLIGHT, MCP_QUEUE_DEPTH, MCP_QUEUE_WAIT, MCP_REJECTED
+
 URLS: Dict[str, str] = {
     "classifier":   "http://mcp_classifier:8001/classify",
     "search":       "http://mcp_websearch:8006/search",
     "scraper":      "http://mcp_scraper:8002/scrape",
+    "scraper_domains": "http://mcp_scraper:8002/domains",
     "summarizer":   "http://mcp_summarizer:8003/summarize_case_raw",
     "entity":       "http://mcp_entity_extractor:8004/extract_raw",
     "vectorizer":   "http://mcp_vectorstore:8005/vectorize",
+    "vectorizer_batch": "http://mcp_vectorstore:8005/vectorize_batch",
     "vectorstore":  "http://mcp_vectorstore:8005/query",
     "record":       "http://mcp_vectorstore:8005/record"  # New endpoint
 }
+# Any endpoint can be overridden with MCP_URL_<NAME> (e.g. to point at local stubs)
+URLS = {name: os.getenv(f"MCP_URL_{name.upper()}", url) for name, url in URLS.items()}
 
 # Define timeouts per MCP
 SCRAPER_TIMEOUT = aiohttp.ClientTimeout(total=180)
+# Budget sent to the scraper: it answers with whatever finished by then,
+# instead of the whole call failing on SCRAPER_TIMEOUT
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", 60))
 DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=120)
+DOMAIN_STATS_TIMEOUT = aiohttp.ClientTimeout(total=5)
 
 HEADERS = {"Content-Type": "application/json"}
 RETRIES = 3
 BACKOFF = 0.5
 
-async def _post(url: str, payload: Dict[str, Any], timeout: aiohttp.ClientTimeout) -> Dict[str, Any]:
-    attempt = 0
-    while attempt < RETRIES:
+# Connection pool settings (one pool per MCP service)
+POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 32))
+POOL_KEEPALIVE = float(os.getenv("HTTP_POOL_KEEPALIVE", 30))
+POOL_DNS_TTL = int(os.getenv("HTTP_POOL_DNS_TTL", 300))
+
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+# Bulkheads: (max concurrent calls, max callers waiting) per MCP service.
+# The LLM-backed services share one Ollama instance, so they get small limits.
+# Override with MCP_LIMIT_<SERVICE> / MCP_QUEUE_<SERVICE>; a limit of 0 means unbounded.
+BULKHEAD_DEFAULTS: Dict[str, tuple] = {
+    "classifier":  (4, 32),
+    "search":      (16, 64),
+    "scraper":     (16, 64),
+    "scraper_domains": (2, 8),
+    "summarizer":  (2, 16),
+    "entity":      (2, 16),
+    "vectorizer":  (16, 64),
+    "vectorizer_batch": (4, 16),
+    "vectorstore": (64, 256),
+    "record":      (64, 256),
+}
+
+
+class ServiceOverloaded(Exception):
+    """Raised when an MCP's wait queue is full; the caller should shed load."""
+
+    def __init__(self, service: str):
+        super().__init__(f"{service} MCP overloaded, wait queue full")
+        self.service = service
+
+
+class Bulkhead:
+    """Caps concurrent calls to one MCP and bounds how many callers may wait."""
+
+    def __init__(self, service: str, limit: int, max_queue: int):
+        self.service = service
+        self.limit = limit
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._sem = asyncio.Semaphore(limit) if limit > 0 else None
+
+    @property
+    def saturated(self) -> bool:
+        return self._sem is not None and self._sem.locked() and self.waiting >= self.max_queue
+
+    async def __aenter__(self):
+        if self._sem is None:
+            return self
+        if self.saturated:
+            MCP_REJECTED.labels(self.service).inc()
+            raise ServiceOverloaded(self.service)
+        self.waiting += 1
+        MCP_QUEUE_DEPTH.labels(self.service).set(self.waiting)
+        t0 = time.perf_counter()
         try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(url, json=payload, headers=HEADERS) as r:
-                    r.raise_for_status()
-                    return await r.json()
-        except Exception as exc:
-            attempt += 1
-            if attempt >= RETRIES:
-                print(f"[http_clients] giving up on {url} – {exc}")
-                return {}
-            await asyncio.sleep(BACKOFF * (2 ** (attempt - 1)))
-
-async def _get(url: str, timeout: aiohttp.ClientTimeout) -> Dict[str, Any]:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+            MCP_QUEUE_DEPTH.labels(self.service).set(self.waiting)
+            MCP_QUEUE_WAIT.labels(self.service).observe(time.perf_counter() - t0)
+        MCP_INFLIGHT.labels(self.service).inc()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._sem is not None:
+            self._sem.release()
+            MCP_INFLIGHT.labels(self.service).dec()
+
+
+BULKHEADS: Dict[str, Bulkhead] = {
+    service: Bulkhead(
+        service,
+        int(os.getenv(f"MCP_LIMIT_{service.upper()}", limit)),
+        int(os.getenv(f"MCP_QUEUE_{service.upper()}", queue)),
+    )
+    for service, (limit, queue) in BULKHEAD_DEFAULTS.items()
+}
+
+
+def _new_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=POOL_LIMIT_PER_HOST,
+        limit_per_host=POOL_LIMIT_PER_HOST,
+        keepalive_timeout=POOL_KEEPALIVE,
+        ttl_dns_cache=POOL_DNS_TTL,
+    )
+    return aiohttp.ClientSession(connector=connector, headers=HEADERS)
+
+
+def get_session(service: str) -> aiohttp.ClientSession:
+    """Return the pooled session for an MCP service, creating it on first use."""
+    session = _sessions.get(service)
+    if session is None or session.closed:
+        session = _sessions[service] = _new_session()
+    return session
+
+
+async def open_sessions() -> None:
+    """Create one keep-alive session per MCP service (called at app startup)."""
+    for service in URLS:
+        get_session(service)
+
+
+async def close_sessions() -> None:
+    """Close every pooled session (called at app shutdown)."""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        await session.close()
+
+
+async def _request(service: str, method: str, url: str, payload: Optional[Dict[str, Any]],
+                   timeout: aiohttp.ClientTimeout) -> Dict[str, Any]:
+    data = json.dumps(payload).encode() if payload is not None else None
+    t_start = time.perf_counter()
     attempt = 0
-    while attempt < RETRIES:
-        try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url) as r:
-                    r.raise_for_status()
-                    return await r.json()
-        except Exception as exc:
-            attempt += 1
-            if attempt >= RETRIES:
-                print(f"[http_clients] giving up on {url} – {exc}")
-                return {}
-            await asyncio.sleep(BACKOFF * (2 ** (attempt - 1)))
+    queue_wait = 0.0
+    sent = 0
+    received = 0
+    status = 0
+    error = ""
+    try:
+        while attempt < RETRIES:
+            try:
+                t_queue = time.perf_counter()
+                # Slot is held per attempt, so backoff sleeps do not occupy the MCP
+                async with BULKHEADS[service]:
+                    queue_wait += time.perf_counter() - t_queue
+                    sent += len(data or b"")
+                    session = get_session(service)
+                    async with session.request(method, url, data=data, headers=tracing.trace_headers(),
+                                               timeout=timeout) as r:
+                        status = r.status
+                        r.raise_for_status()
+                        body = await r.read()
+                        received = len(body)
+                        return json.loads(body)
+            except ServiceOverloaded as exc:
+                error = str(exc)
+                raise
+            except Exception as exc:
+                attempt += 1
+                error = str(exc)
+                if attempt >= RETRIES:
+                    tracing.log.warning("giving up on %s – %s", url, exc)
+                    return {}
+                await asyncio.sleep(BACKOFF * (2 ** (attempt - 1)))
+    finally:
+        tracing.add_span(
+            service, method, url, t_start,
+            queue_wait_ms=round(queue_wait * 1000, 2),
+            retries=attempt,
+            bytes_sent=sent,
+            bytes_received=received,
+            status=status,
+            error=error if not received else "",
+        )
+
+async def _post(service: str, url: str, payload: Dict[str, Any], timeout: aiohttp.ClientTimeout) -> Dict[str, Any]:
+    return await _request(service, "POST", url, payload, timeout)
+
+async def _get(service: str, url: str, timeout: aiohttp.ClientTimeout) -> Dict[str, Any]:
+    return await _request(service, "GET", url, None, timeout)
 
 async def call_classifier(query: str) -> Dict[str, Any]:
-    return await _post(URLS["classifier"], {"query": query}, DEFAULT_TIMEOUT)
+    return await _post("classifier", URLS["classifier"], {"query": query}, DEFAULT_TIMEOUT)
 
 async def call_search(query_payload: Dict[str, Any]) -> Dict[str, Any]:
-    return await _post(URLS["search"], query_payload, DEFAULT_TIMEOUT)
+    return await _post("search", URLS["search"], query_payload, DEFAULT_TIMEOUT)
 
 async def call_scraper(url_list_payload: Dict[str, Any]) -> Dict[str, Any]:
-    # Scraper gets 180s timeout
-    return await _post(URLS["scraper"], url_list_payload, SCRAPER_TIMEOUT)
+    # Scraper gets 180s timeout, but is asked to return partial results well before that
+    payload = {"deadline": SCRAPE_DEADLINE, **url_list_payload}
+    return await _post("scraper", URLS["scraper"], payload, SCRAPER_TIMEOUT)
+
+async def get_scraper_domains() -> Dict[str, Any]:
+    # Per-domain success/latency stats and breaker state, used to pick scrape targets
+    return await _get("scraper_domains", URLS["scraper_domains"], DOMAIN_STATS_TIMEOUT)
 
 async def call_summarizer(corpus_payload: Dict[str, Any]) -> Dict[str, Any]:
-    return await _post(URLS["summarizer"], corpus_payload, DEFAULT_TIMEOUT)
+    return await _post("summarizer", URLS["summarizer"], corpus_payload, DEFAULT_TIMEOUT)
 
 async def call_entity_extractor(summary_payload: Dict[str, Any]) -> Dict[str, Any]:
-    return await _post(URLS["entity"], summary_payload, DEFAULT_TIMEOUT)
+    return await _post("entity", URLS["entity"], summary_payload, DEFAULT_TIMEOUT)
 
 async def call_vectorizer(bundle_payload: Dict[str, Any]) -> Dict[str, Any]:
-    return await _post(URLS["vectorizer"], bundle_payload, DEFAULT_TIMEOUT)
+    return await _post("vectorizer", URLS["vectorizer"], bundle_payload, DEFAULT_TIMEOUT)
+
+async def call_vectorizer_batch(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return await _post("vectorizer_batch", URLS["vectorizer_batch"], {"records": records}, DEFAULT_TIMEOUT)
 
 async def vector_cache_probe(query: str) -> Dict[str, Any]:
-    return await _post(URLS["vectorstore"], {"query": query}, DEFAULT_TIMEOUT)
+    # Probe and fetch in one hop: the top hit comes back with its record inlined
+    payload = {"query": query, "top_k": 1, "include_record": True}
+    return await _post("vectorstore", URLS["vectorstore"], payload, DEFAULT_TIMEOUT)
 
 async def get_record_by_id(record_id: str) -> Dict[str, Any]:
-    url = f'{URLS["record"]}/{record_id}'
-    return await _get(url, DEFAULT_TIMEOUT)
\ No newline at end of file
+    # Only the fields a cache hit uses; skips shipping the scraped article corpus
+    url = f'{URLS["record"]}/{record_id}?fields=summarizer_output,entity_output,websearch_output'
+    return await _get("record", url, DEFAULT_TIMEOUT)
\ No newline at end of file
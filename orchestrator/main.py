@@ -1,19 +1,194 @@
 import asyncio
+import os
 import time
-from typing import Dict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional
 
 import http_clients as hc
 import adapters as ad
-from metrics import LATENCY, FAILURES
+import writebehind
+import freshness
+import domain_health
+from cache import QUERY_CACHE, RECORD_CACHE
+from metrics import LATENCY, FAILURES, REFRESHES, SPECULATIVE_CANCELLED, STALE_HITS
+from singleflight import SingleFlight
+from tracing import finish_trace, log, log_payload, start_trace
+
+# Concurrent requests for the same normalized query share one pipeline run
+FLIGHTS = SingleFlight()
+
+# Start the classifier alongside the cache probe instead of after it
+SPECULATIVE_CLASSIFY = os.getenv("SPECULATIVE_CLASSIFY", "0").lower() in ("1", "true", "yes")
+
+# Background refreshes of stale cache hits, keyed on normalized query
+REFRESH_MAX_INFLIGHT = int(os.getenv("REFRESH_MAX_INFLIGHT", 2))
+_refreshes: Dict[str, asyncio.Task] = {}
+
+# Per-stage concurrency limits for the current context (set by batch runs)
+STAGE_LIMITS: ContextVar[Optional[Dict[str, asyncio.Semaphore]]] = ContextVar("stage_limits", default=None)
+
+
+@asynccontextmanager
+async def stage_slot(stage: str):
+    """Hold one of the stage's concurrency slots, if a limit is set for it."""
+    limits = STAGE_LIMITS.get()
+    sem = limits.get(stage) if limits else None
+    if sem is None:
+        yield
+        return
+    async with sem:
+        yield
+
+def _event(stage: str, data) -> Dict:
+    return {"stage": stage, "data": data}
+
+
+def _error_result(label: str, exc: Exception) -> Dict:
+    result = {"error": f"{label} MCP failed: {exc}"}
+    if isinstance(exc, hc.ServiceOverloaded):
+        # Lets the API answer 503 instead of a generic failure
+        result["overloaded"] = True
+    return result
+
+
+def _scrape_stats(scrape_out: Dict) -> Dict:
+    results = scrape_out.get("results", [])
+    statuses: Dict[str, int] = {}
+    for art in results:
+        status = art.get("status", "")
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "total": len(results),
+        "succeeded": statuses.get("success", 0),
+        "statuses": statuses,
+        "chars": sum(len(art.get("text", "")) for art in results),
+    }
+
 
 async def process_query(original_query: str) -> Dict:
-    cache = await hc.vector_cache_probe(original_query)
-    print("\n[ORCH] cache probe output:", cache)
+    """Run the full pipeline and return only the final result."""
+    result: Dict = {}
+    async for event in process_query_events(original_query):
+        if event["stage"] == "result":
+            result = event["data"]
+    return result
+
+
+async def process_query_events(original_query: str) -> AsyncIterator[Dict]:
+    """
+    Run the pipeline, yielding one {"stage", "data"} event per completed stage.
+    The last event is always stage "result" and carries the same dict
+    process_query returns (including {"error": ...} on failure).
+
+    Identical in-flight queries (after normalization) are coalesced: followers
+    receive the leader's events instead of re-running every MCP.
+    Repeat queries are answered from the in-process L1 cache with no network hop.
+    """
+    key = ad.normalize_query(original_query)
+    cached = QUERY_CACHE.get(key)
+    if cached is not None:
+        log.info("L1 cache HIT, skipping pipeline.")
+        yield _event("result", {**cached, "query": original_query, "cached": True})
+        return
+
+    async for event in FLIGHTS.subscribe(key, lambda: _pipeline_events(original_query)):
+        if event["stage"] == "result" and "query" in event["data"]:
+            # Followers may have asked with different casing/whitespace
+            event = _event("result", {**event["data"], "query": original_query})
+        yield event
+
+
+async def _pipeline_events(original_query: str, refresh_id: Optional[str] = None) -> AsyncIterator[Dict]:
+    # One trace per pipeline run; coalesced followers share the leader's trace
+    trace = start_trace(original_query)
+    try:
+        async for event in _stages(original_query, refresh_id):
+            if event["stage"] == "result":
+                data = event["data"]
+                trace.outcome = "error" if "error" in data else ("cached" if data.get("cached") else "ok")
+            yield event
+    finally:
+        finish_trace(trace)
+
+
+async def _refresh(original_query: str, key: str, record_id: str) -> None:
+    """Re-run the pipeline for a stale hit and upsert the stored record in place."""
+    try:
+        async for event in _pipeline_events(original_query, refresh_id=record_id):
+            if event["stage"] == "result":
+                REFRESHES.labels("error" if "error" in event["data"] else "ok").inc()
+    except Exception as e:
+        REFRESHES.labels("error").inc()
+        log.error("refresh of %r failed: %s", original_query, e)
+    finally:
+        _refreshes.pop(key, None)
+
+
+def _schedule_refresh(original_query: str, key: str, record_id: str) -> None:
+    if key in _refreshes:
+        return  # already being refreshed
+    if len(_refreshes) >= REFRESH_MAX_INFLIGHT:
+        REFRESHES.labels("skipped").inc()  # a later stale hit will try again
+        return
+    _refreshes[key] = asyncio.ensure_future(_refresh(original_query, key, record_id))
+
+
+async def _speculative_classify(original_query: str) -> Dict:
+    # Runs in its own task (with a copy of this context), so it takes its classifier slot itself
+    async with stage_slot("classifier"):
+        return await hc.call_classifier(original_query)
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # A cache hit drops the speculative result unread; keep a failure out of the "never retrieved" log
+    if not task.cancelled():
+        task.exception()
+
+
+async def _stages(original_query: str, refresh_id: Optional[str] = None) -> AsyncIterator[Dict]:
+    """
+    The pipeline proper. With `refresh_id` the cache probe is skipped and the
+    record stored under that id is replaced with the new run's output.
+    """
+    key = ad.normalize_query(original_query)
+    cls_task = None
+    if SPECULATIVE_CLASSIFY and not refresh_id:
+        cls_t0 = time.perf_counter()
+        cls_task = asyncio.ensure_future(_speculative_classify(original_query))
+        cls_task.add_done_callback(_retrieve_exception)
+    try:
+        if refresh_id:
+            cache = {}
+        else:
+            async with stage_slot("probe"):
+                cache = await hc.vector_cache_probe(original_query)
+    except BaseException as e:
+        if cls_task:
+            cls_task.cancel()
+        if isinstance(e, hc.ServiceOverloaded):
+            yield _event("result", _error_result("vectorstore", e))
+            return
+        raise
+    log_payload("cache probe output", cache)
     if cache.get("hits"):
-        print("[ORCH] cache HIT, skipping pipeline.")
-        record_id = cache["hits"][0]["id"]
-        record = await hc.get_record_by_id(record_id)
-        return {
+        log.info("cache HIT, skipping pipeline.")
+        if cls_task and not cls_task.done():
+            cls_task.cancel()
+            SPECULATIVE_CANCELLED.inc()
+        hit = cache["hits"][0]
+        record_id = hit["id"]
+        record = hit.get("record") or RECORD_CACHE.get(record_id)
+        if record is None:
+            try:
+                async with stage_slot("probe"):
+                    record = await hc.get_record_by_id(record_id)
+            except hc.ServiceOverloaded as e:
+                yield _event("result", _error_result("vectorstore", e))
+                return
+            if record:
+                RECORD_CACHE.set(record_id, record)
+        result = {
             "query": original_query, # Added original query
             "cached": True,
             "vector_id": record_id,
@@ -21,6 +196,16 @@ async def process_query(original_query: str) -> Dict:
             "entity_output": record.get("entity_output"),
             "websearch_output": record.get("websearch_output")
         }
+        if freshness.is_stale(hit):
+            # Serve it now, refresh in the background; not kept in L1 so the
+            # next request sees the refreshed record as soon as it lands
+            STALE_HITS.inc()
+            result["stale"] = True
+            _schedule_refresh(original_query, key, record_id)
+        elif record:
+            QUERY_CACHE.set(key, result)
+        yield _event("result", result)
+        return
 
     # === BEGIN: Vectorizer payload ===
     vectorizer_payload = {
@@ -35,72 +220,94 @@ async def process_query(original_query: str) -> Dict:
     # === END: Vectorizer payload ===
 
     # --- Classifier ---
-    print("\n[ORCH] classifier input:", original_query)
-    t0 = time.perf_counter()
+    log_payload("classifier input", original_query)
     try:
-        cls_out = await hc.call_classifier(original_query)
-        print("[ORCH] classifier output (raw):", cls_out)
+        if cls_task:
+            # In speculative mode the classifier has been running since the probe started
+            t0 = cls_t0
+            cls_out = await cls_task
+        else:
+            async with stage_slot("classifier"):
+                t0 = time.perf_counter()
+                cls_out = await hc.call_classifier(original_query)
+        log_payload("classifier output (raw)", cls_out)
     except Exception as e:
         FAILURES.labels("classifier").inc()
-        print(f"[ERROR] MCP classifier failed: {e}")
-        return {"error": f"classifier MCP failed: {e}"}
+        log.error("MCP classifier failed: %s", e)
+        yield _event("result", _error_result("classifier", e))
+        return
     LATENCY.labels("classifier").observe(time.perf_counter() - t0)
+    yield _event("classifier", {
+        "tags": cls_out.get("tags", []),
+        "categories": cls_out.get("categories", []),
+        "category": ad.classifier_category(cls_out),
+    })
 
     # Update vec payload
     vectorizer_payload["tags"] = cls_out.get("tags", [])
-    vectorizer_payload["category"] = cls_out.get("category", "")
+    vectorizer_payload["category"] = ad.classifier_category(cls_out)
 
     search_in = ad.classifier_to_query(cls_out, original_query)
-    print("[ORCH] classifier_to_query (adapted):", search_in)
+    log_payload("classifier_to_query (adapted)", search_in)
 
     # --- Search ---
-    t0 = time.perf_counter()
     try:
-        search_out = await hc.call_search(search_in)
-        print("\n[ORCH] search output (raw):", search_out)
+        async with stage_slot("search"):
+            t0 = time.perf_counter()
+            search_out = await hc.call_search(search_in)
+        log_payload("search output (raw)", search_out)
     except Exception as e:
         FAILURES.labels("search").inc()
-        print(f"[ERROR] MCP search failed: {e}")
-        return {"error": f"search MCP failed: {e}"}
+        log.error("MCP search failed: %s", e)
+        yield _event("result", _error_result("search", e))
+        return
     LATENCY.labels("search").observe(time.perf_counter() - t0)
+    yield _event("search", search_out)
 
     # Update vec payload
     vectorizer_payload["websearch_output"] = search_out
 
-    scraper_in = ad.search_to_urls(search_out)
-    print("[ORCH] search_to_urls (adapted):", scraper_in)
+    scraper_in = ad.search_to_urls(search_out, domain_health.current())
+    log_payload("search_to_urls (adapted)", scraper_in)
 
     # --- Scraper ---
-    t0 = time.perf_counter()
     try:
-        scrape_out = await hc.call_scraper(scraper_in)
-        print("\n[ORCH] scraper output (raw):", scrape_out)
+        async with stage_slot("scraper"):
+            t0 = time.perf_counter()
+            scrape_out = await hc.call_scraper(scraper_in)
+        log_payload("scraper output (raw)", scrape_out)
     except Exception as e:
         FAILURES.labels("scraper").inc()
-        print(f"[ERROR] MCP scraper failed: {e}")
-        return {"error": f"scraper MCP failed: {e}"}
+        log.error("MCP scraper failed: %s", e)
+        yield _event("result", _error_result("scraper", e))
+        return
     LATENCY.labels("scraper").observe(time.perf_counter() - t0)
+    yield _event("scraper", _scrape_stats(scrape_out))
 
     summarizer_in = ad.scraper_to_corpus(scrape_out)
-    print("[ORCH] scraper_to_corpus (adapted):", summarizer_in)
+    log_payload("scraper_to_corpus (adapted)", summarizer_in)
 
     # Update vec payload
     # scraper_output must be a string: merged text, not a dict
     vectorizer_payload["scraper_output"] = summarizer_in.get("merged_text", "")
 
     # --- Summarizer ---
-    t0 = time.perf_counter()
     try:
-        sm_out = await hc.call_summarizer(summarizer_in)
-        print("\n[ORCH] summarizer output (raw):", sm_out)
+        async with stage_slot("summarizer"):
+            t0 = time.perf_counter()
+            sm_out = await hc.call_summarizer(summarizer_in)
+        log_payload("summarizer output (raw)", sm_out)
     except Exception as e:
         FAILURES.labels("summarizer").inc()
-        print(f"[ERROR] MCP summarizer failed: {e}")
-        return {"error": f"summarizer MCP failed: {e}"}
+        log.error("MCP summarizer failed: %s", e)
+        yield _event("result", _error_result("summarizer", e))
+        return
     LATENCY.labels("summarizer").observe(time.perf_counter() - t0)
+    summary_text = sm_out.get("raw_output") if isinstance(sm_out, dict) else sm_out
+    yield _event("summarizer", {"summary_text": summary_text})
 
     entity_in = ad.summarizer_to_summary_text(sm_out)
-    print("[ORCH] summarizer_to_summary_text (adapted):", entity_in)
+    log_payload("summarizer_to_summary_text (adapted)", entity_in)
 
     # Update vec payload
     # summarizer_output must be a string, not dict; use raw_output if present
@@ -110,17 +317,20 @@ async def process_query(original_query: str) -> Dict:
         vectorizer_payload["summarizer_output"] = str(sm_out)
 
     # --- Entity Extractor ---
-    t0 = time.perf_counter()
     try:
-        ent_raw = await hc.call_entity_extractor(entity_in)
-        print("\n[ORCH] entity_extractor output (raw):", ent_raw)
+        async with stage_slot("entity"):
+            t0 = time.perf_counter()
+            ent_raw = await hc.call_entity_extractor(entity_in)
+        log_payload("entity_extractor output (raw)", ent_raw)
         ent_out = ad.entity_output_adapter(ent_raw)
-        print("[ORCH] entity_output_adapter (parsed):", ent_out)
+        log_payload("entity_output_adapter (parsed)", ent_out)
     except Exception as e:
         FAILURES.labels("entity").inc()
-        print(f"[ERROR] MCP entity_extractor failed: {e}")
-        return {"error": f"entity_extractor MCP failed: {e}"}
+        log.error("MCP entity_extractor failed: %s", e)
+        yield _event("result", _error_result("entity_extractor", e))
+        return
     LATENCY.labels("entity").observe(time.perf_counter() - t0)
+    yield _event("entity", ent_out)
 
     # Update vec payload
     # entity_output is a dict, so just assign the adapted output
@@ -128,25 +338,41 @@ async def process_query(original_query: str) -> Dict:
 
     # --- Vectorizer ---
     # (The existing code also does this, but now it's using your running payload variable)
-    print("[ORCH] assemble_vectorizer_payload (adapted):", vectorizer_payload)
-    t0 = time.perf_counter()
-    try:
-        vec_out = await hc.call_vectorizer(vectorizer_payload)
-        print("\n[ORCH] vectorizer output (raw):", vec_out)
-    except Exception as e:
-        FAILURES.labels("vectorizer").inc()
-        print(f"[ERROR] MCP vectorizer failed: {e}")
-        return {"error": f"vectorizer MCP failed: {e}"}
-    LATENCY.labels("vectorizer").observe(time.perf_counter() - t0)
+    if refresh_id:
+        # Replace the stale record under its existing id
+        vectorizer_payload.update(id=refresh_id, upsert=True)
+    log_payload("assemble_vectorizer_payload (adapted)", vectorizer_payload)
+    if writebehind.WRITE_BEHIND:
+        # Respond now; the spool worker stores the record under this id later
+        vec_out = {"id": await writebehind.enqueue(vectorizer_payload)}
+        yield _event("vectorizer", {"vector_id": vec_out["id"], "queued": True})
+    else:
+        try:
+            async with stage_slot("vectorizer"):
+                t0 = time.perf_counter()
+                vec_out = await hc.call_vectorizer(vectorizer_payload)
+            log_payload("vectorizer output (raw)", vec_out)
+        except Exception as e:
+            FAILURES.labels("vectorizer").inc()
+            log.error("MCP vectorizer failed: %s", e)
+            yield _event("result", _error_result("vectorizer", e))
+            return
+        LATENCY.labels("vectorizer").observe(time.perf_counter() - t0)
+        yield _event("vectorizer", {"vector_id": vec_out.get("id")})
 
-    return {
+    result = {
         "query": original_query, # Added original query
         "cached": False,
         "vector_id": vec_out.get("id"),
-        "summary_text": sm_out.get("raw_output") if isinstance(sm_out, dict) else sm_out,
+        "summary_text": summary_text,
         "entity_output": ent_out,
         "websearch_output": vectorizer_payload.get("websearch_output")
     }
+    if result["vector_id"]:
+        QUERY_CACHE.set(key, result)
+    if refresh_id:
+        RECORD_CACHE.pop(refresh_id)
+    yield _event("result", result)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 LATENCY = Histogram(
     "orchestrator_node_latency_seconds",
@@ -10,6 +10,76 @@ FAILURES = Counter(
     "Total MCP call failures",
     ["node"]
 )
+COALESCED = Counter(
+    "orchestrator_coalesced_requests_total",
+    "Requests that joined an identical in-flight query instead of running the pipeline"
+)
+SPECULATIVE_CANCELLED = Counter(
+    "orchestrator_speculative_classifier_cancelled_total",
+    "Speculative classifier calls cancelled because the cache probe hit"
+)
+L1_HITS = Counter(
+    "orchestrator_l1_cache_hits_total",
+    "In-process result cache hits",
+    ["cache"]
+)
+L1_MISSES = Counter(
+    "orchestrator_l1_cache_misses_total",
+    "In-process result cache misses",
+    ["cache"]
+)
+L1_EVICTIONS = Counter(
+    "orchestrator_l1_cache_evictions_total",
+    "In-process result cache entries evicted for size",
+    ["cache"]
+)
+L1_SIZE = Gauge(
+    "orchestrator_l1_cache_entries",
+    "Entries currently held in the in-process result cache",
+    ["cache"]
+)
+MCP_INFLIGHT = Gauge(
+    "orchestrator_mcp_inflight",
+    "MCP calls currently holding a bulkhead slot",
+    ["service"]
+)
+MCP_QUEUE_DEPTH = Gauge(
+    "orchestrator_mcp_queue_depth",
+    "Callers waiting for a bulkhead slot",
+    ["service"]
+)
+MCP_QUEUE_WAIT = Histogram(
+    "orchestrator_mcp_queue_wait_seconds",
+    "Time spent waiting for a bulkhead slot",
+    ["service"]
+)
+MCP_REJECTED = Counter(
+    "orchestrator_mcp_rejected_total",
+    "MCP calls rejected because the bulkhead wait queue was full",
+    ["service"]
+)
+WRITEBEHIND_DEPTH = Gauge(
+    "orchestrator_writebehind_pending",
+    "Records waiting in the write-behind spool"
+)
+WRITEBEHIND_LAG = Gauge(
+    "orchestrator_writebehind_lag_seconds",
+    "Age of the oldest record in the write-behind spool"
+)
+WRITEBEHIND_WRITES = Counter(
+    "orchestrator_writebehind_writes_total",
+    "Write-behind vectorizer attempts by outcome (ok, retry, dropped)",
+    ["outcome"]
+)
+STALE_HITS = Counter(
+    "orchestrator_stale_hits_total",
+    "Cache hits served past their category TTL (a background refresh was requested)"
+)
+REFRESHES = Counter(
+    "orchestrator_refreshes_total",
+    "Background refreshes of stale records by outcome (ok, error, skipped)",
+    ["outcome"]
+)
 
 def start_metrics_server(port: int = 9000):
     start_http_server(port)
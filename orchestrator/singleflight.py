@@ -0,0 +1,86 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from metrics import COALESCED
+
+_DONE = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.queues: List[asyncio.Queue] = []
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight pipeline runs.
+
+    The first caller for a key (the leader) starts the event source in its own
+    task; every caller, leader included, subscribes to that run and receives
+    the full event sequence (replayed from the start for late joiners). The
+    run is not tied to any one caller, so a disconnecting client does not
+    cancel the work the others are waiting on; once the last subscriber has
+    gone, though, the run is cancelled instead of finishing for nobody.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+    def inflight(self) -> int:
+        return len(self._flights)
+
+    async def subscribe(self, key: str, source: Callable[[], AsyncIterator[Dict]]) -> AsyncIterator[Dict]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(self._run(key, flight, source))
+        else:
+            COALESCED.inc()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in flight.events:
+            queue.put_nowait(event)
+        if flight.finished:
+            queue.put_nowait(_DONE)
+        else:
+            flight.queues.append(queue)
+
+        try:
+            while True:
+                event = await queue.get()
+                if event is _DONE:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                yield event
+        finally:
+            if queue in flight.queues:
+                flight.queues.remove(queue)
+            if not flight.finished and not flight.queues:
+                # Nobody is waiting any more; a later caller for this key starts afresh
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(self, key: str, flight: _Flight, source: Callable[[], AsyncIterator[Dict]]) -> None:
+        try:
+            async for event in source():
+                flight.events.append(event)
+                for queue in flight.queues:
+                    queue.put_nowait(event)
+        except asyncio.CancelledError:
+            # Followers must not hang or finish without a result; they get an error instead
+            flight.error = RuntimeError("coalesced pipeline run was cancelled")
+            raise
+        except Exception as exc:
+            flight.error = exc
+        finally:
+            flight.finished = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            for queue in flight.queues:
+                queue.put_nowait(_DONE)
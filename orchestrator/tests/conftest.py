@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Service modules import each other by bare name (as in the Docker image), and
+# several services share module names (main, cache, metrics). Put this service
+# first on sys.path and drop same-named modules another service's tests loaded.
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SERVICE_DIR)
+
+for _name, _module in list(sys.modules.items()):
+    _dir = os.path.dirname(os.path.abspath(getattr(_module, "__file__", None) or REPO_DIR))
+    if os.path.dirname(_dir) == REPO_DIR and _dir != SERVICE_DIR:
+        del sys.modules[_name]
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
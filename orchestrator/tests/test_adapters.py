@@ -0,0 +1,37 @@
+from adapters import ARTICLES_PER_LIST, search_to_urls
+
+
+def _articles(*urls):
+    return [{"url": url, "title": url.rsplit("/", 1)[-1]} for url in urls]
+
+
+def _urls(out):
+    return [a["url"] for a in out["articles"]]
+
+
+def test_takes_top_of_each_list_without_duplicates():
+    relevant = _articles(*(f"https://r.example/{i}" for i in range(ARTICLES_PER_LIST + 2)))
+    recent = _articles("https://r.example/0", "https://n.example/1")
+    out = search_to_urls({"most_relevant": relevant, "most_recent": recent})
+    assert _urls(out) == [f"https://r.example/{i}" for i in range(ARTICLES_PER_LIST)] + ["https://n.example/1"]
+
+
+def test_open_breaker_domains_are_skipped_and_backfilled():
+    relevant = _articles(*(f"https://www.down.example/{i}" for i in range(2)),
+                         *(f"https://up.example/{i}" for i in range(ARTICLES_PER_LIST + 1)))
+    stats = {"down.example": {"state": "open", "score": 0.0}}
+    out = search_to_urls({"most_relevant": relevant}, stats)
+    assert _urls(out) == [f"https://up.example/{i}" for i in range(ARTICLES_PER_LIST)]
+
+
+def test_sorted_by_domain_score_with_unknown_in_between():
+    relevant = _articles("https://weak.example/a", "https://new.example/b", "https://strong.example/c")
+    stats = {"weak.example": {"state": "closed", "score": 0.2},
+             "strong.example": {"state": "half_open", "score": 0.9}}
+    out = search_to_urls({"most_relevant": relevant}, stats)
+    assert _urls(out) == ["https://strong.example/c", "https://new.example/b", "https://weak.example/a"]
+
+
+def test_without_stats_input_order_is_kept():
+    relevant = _articles("https://b.example/1", "https://a.example/2")
+    assert _urls(search_to_urls({"most_relevant": relevant})) == ["https://b.example/1", "https://a.example/2"]
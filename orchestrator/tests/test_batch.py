@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+import main
+from batch import parse_limits, run_batch, validate_limits
+
+
+def test_positive_limits_are_accepted():
+    assert validate_limits({"summarizer": 2, "scraper": 16}) == {"summarizer": 2, "scraper": 16}
+
+
+@pytest.mark.parametrize("limits", [
+    {"summarizer": True},
+    {"summarizer": False},
+    {"summarizer": 0},
+    {"summarizer": -1},
+    {"summarizer": 1.5},
+    {"summarizer": "2"},
+    {"nope": 2},
+])
+def test_bad_limits_are_rejected(limits):
+    with pytest.raises(ValueError):
+        validate_limits(limits)
+
+
+def test_cli_limits():
+    assert parse_limits(["summarizer=2", "entity=1"]) == {"summarizer": 2, "entity": 1}
+    for bad in (["summarizer=0"], ["summarizer=-1"], ["summarizer"], ["nope=1"]):
+        with pytest.raises(ValueError):
+            parse_limits(bad)
+
+
+def test_closing_the_batch_stops_queued_pipelines(monkeypatch):
+    finished = []
+
+    async def stages(query, refresh_id=None):
+        if query != "query 0":
+            await asyncio.sleep(0.2)
+            finished.append(query)
+        yield {"stage": "result", "data": {"query": query}}
+
+    monkeypatch.setattr(main, "_stages", stages)
+
+    async def run():
+        items = run_batch([f"query {i}" for i in range(10)], max_inflight=10)
+        first = await items.__anext__()
+        await items.aclose()  # the client disconnected
+        await asyncio.sleep(0.3)
+        return first, main.FLIGHTS.inflight()
+
+    first, inflight = asyncio.run(run())
+    assert first["query"] == "query 0"
+    assert finished == [] and inflight == 0
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+import http_clients as hc
+import main
+from cache import QUERY_CACHE
+from http_clients import Bulkhead, ServiceOverloaded
+
+
+def test_calls_beyond_limit_wait_for_a_slot():
+    async def run():
+        bulkhead, running, peak = Bulkhead("test", limit=2, max_queue=8), [0], [0]
+
+        async def call():
+            async with bulkhead:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                await asyncio.sleep(0.01)
+                running[0] -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak[0]
+
+    assert asyncio.run(run()) == 2
+
+
+def test_full_queue_is_rejected():
+    async def run():
+        bulkhead = Bulkhead("test", limit=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with bulkhead:
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        waiter = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        assert bulkhead.saturated
+        with pytest.raises(ServiceOverloaded):
+            async with bulkhead:
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return bulkhead.saturated
+
+    assert asyncio.run(run()) is False
+
+
+def test_zero_limit_is_unbounded():
+    async def run():
+        bulkhead = Bulkhead("test", limit=0, max_queue=0)
+        async with bulkhead:
+            async with bulkhead:
+                return bulkhead.saturated
+
+    assert asyncio.run(run()) is False
+
+
+def test_cache_hit_is_served_while_another_mcp_is_saturated(monkeypatch):
+    QUERY_CACHE.clear()
+    summarizer = Bulkhead("summarizer", limit=1, max_queue=0)
+    monkeypatch.setitem(hc.BULKHEADS, "summarizer", summarizer)
+
+    async def probe(query):
+        record = {"summarizer_output": "s", "entity_output": {}, "websearch_output": {}}
+        return {"hits": [{"id": "r1", "record": record, "category": "crime"}]}
+
+    monkeypatch.setattr(hc, "vector_cache_probe", probe)
+
+    async def run():
+        async with summarizer:  # summarizer is now full, with no room to queue
+            assert summarizer.saturated
+            return await main.process_query("some cached query")
+
+    result = asyncio.run(run())
+    QUERY_CACHE.clear()
+    assert result["cached"] is True and "overloaded" not in result
+
+
+def test_saturated_stage_sheds_the_request(monkeypatch):
+    QUERY_CACHE.clear()
+    monkeypatch.setitem(hc.BULKHEADS, "vectorstore", Bulkhead("vectorstore", limit=1, max_queue=0))
+
+    async def run():
+        async with hc.BULKHEADS["vectorstore"]:
+            return await main.process_query("a query that needs the probe")
+
+    result = asyncio.run(run())
+    assert result.get("overloaded") is True
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+import freshness
+
+
+def test_age_of_naive_and_zulu_timestamps():
+    now = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    assert freshness.age_seconds("2025-01-01T00:00:00", now) == 86400
+    assert freshness.age_seconds("2025-01-01T00:00:00Z", now) == 86400
+    assert freshness.age_seconds("not a date", now) is None
+    assert freshness.age_seconds(None, now) is None
+
+
+def test_ttl_per_category(monkeypatch):
+    monkeypatch.setitem(freshness.RECORD_TTLS, "legal", 60)
+    monkeypatch.setattr(freshness, "RECORD_TTL", 3600)
+    monkeypatch.setenv("RECORD_TTL_SPORTS", "10")
+    assert freshness.ttl_for("Legal") == 60
+    assert freshness.ttl_for(None) == 3600
+    assert freshness.ttl_for("sports") == 10
+    assert freshness.ttl_for("unknown") == 3600
+
+
+def test_is_stale(monkeypatch):
+    monkeypatch.setitem(freshness.RECORD_TTLS, "legal", 60)
+    monkeypatch.setitem(freshness.RECORD_TTLS, "other", 0)
+    old = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    assert freshness.is_stale({"category": "legal", "timestamp": old})
+    assert not freshness.is_stale({"category": "other", "timestamp": old})  # 0 = never stale
+    assert not freshness.is_stale({"category": "legal", "timestamp": datetime.now(timezone.utc).isoformat()})
+    assert not freshness.is_stale({"category": "legal"})
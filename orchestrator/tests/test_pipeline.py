@@ -0,0 +1,74 @@
+import asyncio
+import gc
+
+import pytest
+
+import http_clients as hc
+import main
+from batch import run_batch
+from cache import QUERY_CACHE, RECORD_CACHE
+
+
+@pytest.fixture(autouse=True)
+def _clean_caches():
+    QUERY_CACHE.clear()
+    RECORD_CACHE.clear()
+    yield
+    QUERY_CACHE.clear()
+    RECORD_CACHE.clear()
+
+
+def test_speculative_classifier_respects_batch_stage_limit(monkeypatch):
+    running, peak = [0], [0]
+
+    async def probe(query):
+        return {"hits": []}
+
+    async def classify(query):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return {"categories": ["crime"], "tags": []}
+
+    async def search(payload):
+        raise RuntimeError("stop here")
+
+    monkeypatch.setattr(main, "SPECULATIVE_CLASSIFY", True)
+    monkeypatch.setattr(hc, "vector_cache_probe", probe)
+    monkeypatch.setattr(hc, "call_classifier", classify)
+    monkeypatch.setattr(hc, "call_search", search)
+
+    async def run():
+        return [item async for item in run_batch([f"query {i}" for i in range(5)], {"classifier": 1})]
+
+    items = asyncio.run(run())
+    assert len(items) == 5
+    assert peak[0] == 1
+
+
+def test_failed_speculative_classifier_on_cache_hit_is_not_logged_as_unretrieved(monkeypatch):
+    unhandled = []
+
+    async def classify(query):
+        raise hc.ServiceOverloaded("classifier")
+
+    async def probe(query):
+        await asyncio.sleep(0.01)  # the classifier has failed by now
+        record = {"summarizer_output": "s", "entity_output": {}, "websearch_output": {}}
+        return {"hits": [{"id": "r1", "record": record, "category": "crime"}]}
+
+    monkeypatch.setattr(main, "SPECULATIVE_CLASSIFY", True)
+    monkeypatch.setattr(hc, "call_classifier", classify)
+    monkeypatch.setattr(hc, "vector_cache_probe", probe)
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: unhandled.append(ctx))
+        result = await main.process_query("a cached query")
+        gc.collect()
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run())["cached"] is True
+    gc.collect()
+    assert unhandled == []
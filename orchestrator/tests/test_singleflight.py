@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _source(calls, gate=None, fail=None):
+    async def source():
+        calls.append(1)
+        yield {"stage": "classifier", "data": {}}
+        if gate is not None:
+            await gate.wait()
+        if fail is not None:
+            raise fail
+        yield {"stage": "result", "data": {"ok": True}}
+    return source
+
+
+async def _collect(flights, key, source):
+    return [event async for event in flights.subscribe(key, source)]
+
+
+def test_identical_queries_share_one_run():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        leader = asyncio.ensure_future(_collect(flights, "q", _source(calls, gate)))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(_collect(flights, "q", _source(calls, gate)))
+        await asyncio.sleep(0)
+        gate.set()
+        return calls, await leader, await follower, flights.inflight()
+
+    calls, leader, follower, inflight = asyncio.run(run())
+    assert len(calls) == 1
+    assert leader == follower
+    assert [e["stage"] for e in follower] == ["classifier", "result"]
+    assert inflight == 0
+
+
+def test_late_joiner_gets_replayed_events():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        leader = asyncio.ensure_future(_collect(flights, "q", _source(calls, gate)))
+        await asyncio.sleep(0.01)  # first event already emitted
+        follower = asyncio.ensure_future(_collect(flights, "q", _source(calls, gate)))
+        await asyncio.sleep(0)
+        gate.set()
+        return await leader, await follower
+
+    leader, follower = asyncio.run(run())
+    assert leader == follower and len(follower) == 2
+
+
+def test_source_error_reaches_every_subscriber():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        source = _source(calls, gate, fail=ValueError("boom"))
+        tasks = [asyncio.ensure_future(_collect(flights, "q", source)) for _ in range(2)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_run_fails_followers_instead_of_ending_silently():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        follower = asyncio.ensure_future(_collect(flights, "q", _source(calls, gate)))
+        await asyncio.sleep(0.01)
+        flights._flights["q"].task.cancel()
+        return await asyncio.gather(follower, return_exceptions=True)
+
+    (result,) = asyncio.run(run())
+    assert isinstance(result, RuntimeError)
+
+
+def test_disconnecting_subscriber_does_not_cancel_the_run():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        leaver = asyncio.ensure_future(_collect(flights, "q", _source(calls, gate)))
+        stayer = asyncio.ensure_future(_collect(flights, "q", _source(calls, gate)))
+        await asyncio.sleep(0.01)
+        leaver.cancel()
+        gate.set()
+        return await stayer
+
+    events = asyncio.run(run())
+    assert events[-1] == {"stage": "result", "data": {"ok": True}}
+
+
+def test_new_run_after_previous_finished():
+    async def run():
+        flights, calls = SingleFlight(), []
+        await _collect(flights, "q", _source(calls))
+        await _collect(flights, "q", _source(calls))
+        return calls
+
+    assert len(asyncio.run(run())) == 2
+
+
+@pytest.mark.parametrize("key", ["a", "b"])
+def test_different_keys_run_separately(key):
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        tasks = [asyncio.ensure_future(_collect(flights, k, _source(calls, gate))) for k in ("a", key)]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        return calls
+
+    assert len(asyncio.run(run())) == (1 if key == "a" else 2)
+
+
+def test_run_is_cancelled_when_its_last_subscriber_leaves():
+    async def run():
+        flights, calls, gate, finished = SingleFlight(), [], asyncio.Event(), []
+
+        async def source():
+            calls.append(1)
+            yield {"stage": "classifier", "data": {}}
+            await gate.wait()
+            finished.append(1)
+            yield {"stage": "result", "data": {}}
+
+        only = asyncio.ensure_future(_collect(flights, "q", source))
+        await asyncio.sleep(0.01)
+        run_task = flights._flights["q"].task
+        only.cancel()
+        await asyncio.sleep(0)
+        # A new caller for the same key gets a fresh run, not the abandoned one
+        again = asyncio.ensure_future(_collect(flights, "q", source))
+        await asyncio.sleep(0.01)
+        gate.set()
+        events = await again
+        return run_task.cancelled(), calls, finished, events
+
+    cancelled, calls, finished, events = asyncio.run(run())
+    assert cancelled
+    assert len(calls) == 2 and len(finished) == 1
+    assert events[-1]["stage"] == "result"
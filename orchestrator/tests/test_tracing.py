@@ -0,0 +1,28 @@
+import asyncio
+import json
+import threading
+
+import tracing
+
+
+def test_file_export_runs_off_the_event_loop(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT", "file")
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+    writers = []
+    append = tracing._append_to_file
+
+    def spy(line):
+        writers.append(threading.current_thread())
+        append(line)
+
+    monkeypatch.setattr(tracing, "_append_to_file", spy)
+
+    async def run():
+        for query in ("a", "b"):
+            tracing.finish_trace(tracing.start_trace(query))
+        await tracing.close_exporter()
+
+    asyncio.run(run())
+    assert threading.main_thread() not in writers
+    assert sorted(json.loads(line)["query"] for line in path.read_text().splitlines()) == ["a", "b"]
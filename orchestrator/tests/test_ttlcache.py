@@ -0,0 +1,49 @@
+import cache
+from cache import TTLCache
+
+
+def test_get_returns_what_was_set():
+    c = TTLCache("test", maxsize=4, ttl=60)
+    c.set("a", {"x": 1})
+    assert c.get("a") == {"x": 1}
+    assert c.get("missing") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    c = TTLCache("test", maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")  # a is now the most recently used
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert len(c) == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    c = TTLCache("test", maxsize=4, ttl=10)
+    c.set("a", 1)
+    now[0] += 9
+    assert c.get("a") == 1
+    now[0] += 2
+    assert c.get("a") is None
+    assert len(c) == 0
+
+
+def test_zero_size_disables_the_cache():
+    c = TTLCache("test", maxsize=0, ttl=60)
+    c.set("a", 1)
+    assert c.get("a") is None
+
+
+def test_pop_and_clear():
+    c = TTLCache("test", maxsize=4, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.pop("a")
+    c.pop("never-set")
+    assert c.get("a") is None and c.get("b") == 2
+    c.clear()
+    assert len(c) == 0
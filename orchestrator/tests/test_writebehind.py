@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+import http_clients as hc
+import writebehind
+from metrics import WRITEBEHIND_DEPTH
+from writebehind import Spool
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path / "spool.sqlite"))
+    monkeypatch.setattr(writebehind, "_spool", spool)
+    yield spool
+    spool.close()
+
+
+def test_claim_leases_records_in_fifo_order(spool):
+    for i in range(3):
+        spool.put(f"r{i}", {"query": f"q{i}"})
+    first = spool.claim(2)
+    assert [(rid, payload["query"], attempts) for rid, payload, attempts in first] == [
+        ("r0", "q0", 0), ("r1", "q1", 0)]
+    # Leased records stay in the spool but are not handed out again
+    assert [rid for rid, _, _ in spool.claim(5)] == ["r2"]
+    assert spool.stats()[0] == 3
+
+
+def test_ack_and_retry(spool):
+    spool.put("a", {})
+    spool.put("b", {})
+    spool.claim(2)
+    spool.ack(["a"])
+    spool.retry("b", 1)
+    assert spool.stats()[0] == 1
+    assert spool.claim(5) == []  # "b" is backing off
+    spool._conn.execute("UPDATE spool SET next_attempt = 0")
+    assert spool.claim(5) == [("b", {}, 1)]
+
+
+def test_enqueue_spools_without_reading_stats(spool, monkeypatch):
+    def stats():
+        raise AssertionError("stats() on the request path")
+
+    monkeypatch.setattr(spool, "stats", stats)
+    WRITEBEHIND_DEPTH.set(0)
+    record_id = asyncio.run(writebehind.enqueue({"query": "q"}))
+    assert WRITEBEHIND_DEPTH._value.get() == 1
+    assert spool.claim(1)[0][0] == record_id
+
+
+def test_drain_acks_stored_and_retries_the_rest(spool, monkeypatch):
+    async def vectorize_batch(records):
+        return {"results": [{"id": r["id"], "status": "inserted"} for r in records if r["query"] == "ok"]}
+
+    monkeypatch.setattr(hc, "call_vectorizer_batch", vectorize_batch)
+    spool.put("good", {"id": "good", "query": "ok"})
+    spool.put("bad", {"id": "bad", "query": "fails"})
+    assert asyncio.run(writebehind.drain_once()) == 2
+    remaining = spool._conn.execute("SELECT id, attempts FROM spool").fetchall()
+    assert remaining == [("bad", 1)]
+    assert WRITEBEHIND_DEPTH._value.get() == 1
+
+
+def test_drain_drops_records_the_vectorizer_rejects(spool, monkeypatch):
+    async def vectorize_batch(records):
+        return {"results": [{"id": r["id"], "status": "invalid"} for r in records]}
+
+    monkeypatch.setattr(hc, "call_vectorizer_batch", vectorize_batch)
+    spool.put("blank", {"id": "blank", "query": " "})
+    asyncio.run(writebehind.drain_once())
+    assert spool.stats()[0] == 0
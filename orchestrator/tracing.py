@@ -0,0 +1,169 @@
+"""
+Per-request tracing and payload logging for the pipeline.
+
+Every pipeline run gets a trace id that is sent to each MCP in the
+X-Trace-Id header. Each MCP call records a span (timings, bytes on the wire,
+retries, bulkhead queue wait). When the run finishes, the trace is exported as
+one JSON object to a local JSONL file or an HTTP collector.
+
+Full stage payloads are only logged at DEBUG level, only for a sampled
+fraction of traces, and truncated.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+PAYLOAD_LOG_SAMPLE = float(os.getenv("PAYLOAD_LOG_SAMPLE", 0.01))  # fraction of traces
+PAYLOAD_LOG_MAX_CHARS = int(os.getenv("PAYLOAD_LOG_MAX_CHARS", 2000))
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "none").lower()  # none | file | http
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL", "")
+
+TRACE_HEADER = "X-Trace-Id"
+
+log = logging.getLogger("orchestrator")
+log.setLevel(LOG_LEVEL)
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(message)s"))
+    log.addHandler(_handler)
+    log.propagate = False
+
+
+class Trace:
+    def __init__(self, query: str):
+        self.trace_id = uuid.uuid4().hex
+        self.query = query
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.sampled = random.random() < PAYLOAD_LOG_SAMPLE
+        self.outcome = ""
+        self.spans: List[Dict[str, Any]] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "query": self.query,
+            "start": self.started_at,
+            "duration_ms": round((time.perf_counter() - self.t0) * 1000, 2),
+            "outcome": self.outcome,
+            "spans": self.spans,
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current.get()
+        record.trace_id = trace.trace_id[:8] if trace else "-"
+        return True
+
+
+log.addFilter(_TraceIdFilter())
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def trace_headers() -> Dict[str, str]:
+    trace = _current.get()
+    return {TRACE_HEADER: trace.trace_id} if trace else {}
+
+
+def start_trace(query: str) -> Trace:
+    """Start a trace for this pipeline run (scoped to the current task)."""
+    trace = Trace(query)
+    _current.set(trace)
+    return trace
+
+
+def add_span(service: str, method: str, url: str, t_start: float, **fields: Any) -> None:
+    """Record one MCP call on the current trace; no-op outside a trace."""
+    trace = _current.get()
+    if trace is None:
+        return
+    trace.spans.append({
+        "service": service,
+        "method": method,
+        "url": url,
+        "start_ms": round((t_start - trace.t0) * 1000, 2),
+        "duration_ms": round((time.perf_counter() - t_start) * 1000, 2),
+        **fields,
+    })
+
+
+def log_payload(label: str, payload: Any) -> None:
+    """Log a (truncated) stage payload, but only at DEBUG and for sampled traces."""
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    trace = _current.get()
+    if trace is not None and not trace.sampled:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    if len(text) > PAYLOAD_LOG_MAX_CHARS:
+        text = f"{text[:PAYLOAD_LOG_MAX_CHARS]}… ({len(text)} chars)"
+    log.debug("%s: %s", label, text)
+
+
+_collector: Optional[aiohttp.ClientSession] = None
+
+
+async def _post_to_collector(record: Dict[str, Any]) -> None:
+    global _collector
+    try:
+        if _collector is None or _collector.closed:
+            _collector = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        async with _collector.post(TRACE_COLLECTOR_URL, json=record) as r:
+            r.raise_for_status()
+    except Exception as exc:
+        log.warning("trace export to %s failed – %s", TRACE_COLLECTOR_URL, exc)
+
+
+_file_lock = threading.Lock()  # one trace line at a time, whichever thread writes it
+_file_writes: "set[asyncio.Future]" = set()
+
+
+def _append_to_file(line: str) -> None:
+    try:
+        with _file_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as exc:
+        log.warning("trace export to %s failed – %s", TRACE_FILE, exc)
+
+
+def finish_trace(trace: Trace) -> None:
+    """Export a finished trace to the configured sink."""
+    record = trace.to_dict()
+    log.info("trace done outcome=%s duration_ms=%s spans=%d",
+             record["outcome"], record["duration_ms"], len(record["spans"]))
+    if TRACE_EXPORT == "file":
+        # File I/O runs in a worker thread, off the event loop
+        line = json.dumps(record, default=str) + "\n"
+        future = asyncio.get_running_loop().run_in_executor(None, _append_to_file, line)
+        _file_writes.add(future)
+        future.add_done_callback(_file_writes.discard)
+    elif TRACE_EXPORT == "http" and TRACE_COLLECTOR_URL:
+        asyncio.ensure_future(_post_to_collector(record))
+
+
+async def close_exporter() -> None:
+    global _collector
+    if _file_writes:
+        await asyncio.gather(*_file_writes)
+    if _collector is not None:
+        await _collector.close()
+        _collector = None
@@ -0,0 +1,222 @@
+"""
+Write-behind vectorization.
+
+With WRITE_BEHIND=1 the pipeline does not wait for the vectorizer: the record
+gets its id up front, is appended to a durable SQLite spool, and the response
+goes out. A background worker drains the spool to /vectorize_batch and
+retries failures with exponential backoff. Records survive restarts.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import http_clients as hc
+from metrics import WRITEBEHIND_DEPTH, WRITEBEHIND_LAG, WRITEBEHIND_WRITES
+from tracing import log
+
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+SPOOL_PATH = os.getenv("WRITE_BEHIND_SPOOL", "writebehind_spool.sqlite")
+BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH", 16))
+POLL_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", 1.0))  # seconds
+MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", 10))
+BACKOFF_MAX = float(os.getenv("WRITE_BEHIND_BACKOFF_MAX", 300))  # seconds
+# A claimed batch is invisible to other workers for this long (crash recovery)
+LEASE = float(os.getenv("WRITE_BEHIND_LEASE", 60))  # seconds
+# How long shutdown waits for the spool to empty before leaving the rest for next start
+SHUTDOWN_DRAIN = float(os.getenv("WRITE_BEHIND_SHUTDOWN_DRAIN", 10))  # seconds
+
+
+class Spool:
+    """Durable FIFO of pending /vectorize payloads, shared safely across worker processes."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id TEXT PRIMARY KEY, payload TEXT NOT NULL, enqueued_at REAL NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL)"
+        )
+        # claim() orders by it and stats() takes its MIN
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spool_enqueued_at ON spool (enqueued_at)")
+        self._lock = threading.Lock()
+
+    def put(self, record_id: str, payload: Dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO spool (id, payload, enqueued_at, next_attempt) VALUES (?, ?, ?, ?)",
+                (record_id, json.dumps(payload), now, now),
+            )
+
+    def claim(self, limit: int) -> List[Tuple[str, Dict, int]]:
+        """Take up to `limit` due records, leasing them so no other worker picks them up."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, payload, attempts FROM spool WHERE next_attempt <= ? "
+                    "ORDER BY enqueued_at LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE spool SET next_attempt = ? WHERE id = ?",
+                    [(now + LEASE, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(rid, json.loads(payload), attempts) for rid, payload, attempts in rows]
+
+    def ack(self, record_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM spool WHERE id = ?", [(rid,) for rid in record_ids])
+
+    def retry(self, record_id: str, attempts: int) -> None:
+        delay = min(BACKOFF_MAX, 2 ** attempts)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE spool SET attempts = ?, next_attempt = ? WHERE id = ?",
+                (attempts, time.time() + delay, record_id),
+            )
+
+    def stats(self) -> Tuple[int, float]:
+        """(pending records, age in seconds of the oldest one)."""
+        with self._lock:
+            count, oldest = self._conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM spool").fetchone()
+        return count, (time.time() - oldest) if oldest else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_spool: Optional[Spool] = None
+_worker: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+def get_spool() -> Spool:
+    global _spool
+    if _spool is None:
+        _spool = Spool(SPOOL_PATH)
+    return _spool
+
+
+def _update_metrics() -> Tuple[int, float]:
+    depth, lag = get_spool().stats()
+    WRITEBEHIND_DEPTH.set(depth)
+    WRITEBEHIND_LAG.set(lag)
+    return depth, lag
+
+
+async def enqueue(payload: Dict) -> str:
+    """Assign the record id (unless the payload has one), spool it and return the id immediately."""
+    record_id = payload.get("id") or str(uuid.uuid4())
+    await asyncio.to_thread(get_spool().put, record_id, {**payload, "id": record_id})
+    # The worker resets both gauges from the spool on its next tick
+    WRITEBEHIND_DEPTH.inc()
+    if _wakeup is not None:
+        _wakeup.set()
+    return record_id
+
+
+def _failed(spool: Spool, record_id: str, attempts: int) -> bool:
+    """Schedule a retry; return True once the record should be dropped instead."""
+    attempts += 1
+    if attempts >= MAX_ATTEMPTS:
+        WRITEBEHIND_WRITES.labels("dropped").inc()
+        log.error("write-behind %s: giving up after %d attempts", record_id, attempts)
+        return True
+    WRITEBEHIND_WRITES.labels("retry").inc()
+    spool.retry(record_id, attempts)
+    return False
+
+
+def _settle(spool: Spool, batch: List[Tuple[str, Dict, int]], stored: set, invalid: set) -> None:
+    """Ack the stored records, drop the ones the vectorizer can never store, retry the rest."""
+    done = []
+    for record_id, _, attempts in batch:
+        if record_id in stored:
+            WRITEBEHIND_WRITES.labels("ok").inc()
+            done.append(record_id)
+        elif record_id in invalid:
+            WRITEBEHIND_WRITES.labels("dropped").inc()
+            log.error("write-behind %s: rejected by the vectorizer as invalid", record_id)
+            done.append(record_id)
+        elif _failed(spool, record_id, attempts):
+            done.append(record_id)
+    spool.ack(done)
+
+
+async def drain_once() -> int:
+    """Send one batch from the spool via /vectorize_batch; return how many records were claimed."""
+    spool = get_spool()
+    # Spool I/O runs in a thread so SQLite never blocks the event loop
+    batch = await asyncio.to_thread(spool.claim, BATCH_SIZE)
+    if batch:
+        try:
+            out = await hc.call_vectorizer_batch([payload for _, payload, _ in batch])
+        except Exception as e:
+            out = {}
+            log.warning("write-behind: vectorizer batch error: %s", e)
+        # "duplicate" means an earlier attempt already stored it
+        results = out.get("results", [])
+        stored = {item["id"] for item in results if item.get("status") != "invalid"}
+        invalid = {item["id"] for item in results if item.get("status") == "invalid"}
+        await asyncio.to_thread(_settle, spool, batch, stored, invalid)
+    await asyncio.to_thread(_update_metrics)
+    return len(batch)
+
+
+async def _run() -> None:
+    while True:
+        try:
+            if await drain_once():
+                continue  # more may be due; keep going without sleeping
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error("write-behind worker error: %s", e)
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_worker() -> None:
+    global _worker, _wakeup
+    if not WRITE_BEHIND or _worker is not None:
+        return
+    _wakeup = asyncio.Event()
+    _worker = asyncio.create_task(_run())
+    depth, lag = _update_metrics()
+    if depth:
+        log.info("write-behind: resuming %d spooled record(s), oldest %.0fs", depth, lag)
+
+
+async def stop_worker(drain_timeout: float = 0) -> None:
+    """Stop the worker, first waiting up to `drain_timeout` seconds for the spool to empty."""
+    global _worker, _wakeup, _spool
+    if _worker is None:
+        return
+    deadline = time.monotonic() + drain_timeout
+    while time.monotonic() < deadline and (await asyncio.to_thread(get_spool().stats))[0]:
+        await asyncio.sleep(min(POLL_INTERVAL, 0.2))
+    _worker.cancel()
+    try:
+        await _worker
+    except asyncio.CancelledError:
+        pass
+    _worker = _wakeup = None
+    _spool.close()
+    _spool = None